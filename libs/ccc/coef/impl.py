@@ -4,19 +4,36 @@ Contains function that implement the Clustermatch Correlation Coefficient (CCC).
 from __future__ import annotations
 
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed, ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
 from typing import Iterable, Union
 
 import numpy as np
 from numpy.typing import NDArray
-from numba import njit
+from numba import njit, prange, get_num_threads, set_num_threads, config
 from numba.typed import List
 
 from ccc.pytorch.core import unravel_index_2d
-from ccc.sklearn.metrics import adjusted_rand_index as ari
+from ccc.sklearn.metrics import get_adjusted_rand_index_from_pair_counts
 from ccc.scipy.stats import rank
 from ccc.utils import chunker, DummyExecutor
 
+# maximum number of elements in the cache of ARI values between unique
+# partitions (see cdist_parts_cached); 2**24 float64 values take 128 MB
+MAX_ARI_CACHE_SIZE = 2**24
+
+# the cache of ARI values is only used if the fraction of unique partitions
+# (across all features and k values) is below this value; otherwise, there are
+# too few repeated partitions to compensate for the cache lookups
+MAX_UNIQUE_PARTS_FRACTION = 0.5
+
+# absolute tolerance used when comparing an ARI upper bound with an ARI value
+# (see get_max_ari)
+ARI_UPPER_BOUND_TOLERANCE = 1e-10
+
+# number of features in each side of the square tiles of feature pairs
+# processed by compute_coef (see compute_coef_block_row)
+COEF_TILE_SIZE = 32
+
 
 @njit(cache=True, nogil=True)
 def get_perc_from_k(k: int) -> list[float]:
@@ -35,6 +52,75 @@ def get_perc_from_k(k: int) -> list[float]:
     return [(1.0 / k) * i for i in range(1, k)]
 
 
+@njit(cache=True, nogil=True)
+def get_quantile_ranks(data: NDArray) -> tuple[NDArray[np.int64], NDArray[float]]:
+    """
+    It sorts the data and computes its ranks normalized to the range (0, 1].
+    These are the only expensive steps in quantile clustering and they do not
+    depend on the number of clusters, so they can be shared across different
+    k values (see assign_quantile_clusters).
+
+    Args:
+        data: a 1d numpy array with numerical values.
+
+    Returns:
+        A tuple with two elements: 1) the indexes that sort data, and 2) the
+        normalized ranks of data (rank / len(data)) in sorted order.
+    """
+    data_sorted = np.argsort(data, kind="quicksort")
+    data_rank = rank(data, data_sorted)
+    data_perc = data_rank / len(data)
+
+    return data_sorted, data_perc[data_sorted]
+
+
+@njit(cache=True, nogil=True)
+def assign_quantile_clusters(
+    data_sorted: NDArray[np.int64], data_perc_sorted: NDArray[float], k: int
+) -> NDArray[np.int16]:
+    """
+    It performs quantile clustering (see run_quantile_clustering) given the
+    sorted data indexes and ranks returned by get_quantile_ranks.
+
+    Args:
+        data_sorted: the indexes that sort the data.
+        data_perc_sorted: the normalized ranks of the data in sorted order.
+        k: the number of clusters to split the data into.
+
+    Returns:
+        A 1d array with the data partition.
+    """
+    n = data_sorted.shape[0]
+
+    # the cut point for percentile p is the number of objects with a
+    # normalized rank <= p (same as np.searchsorted with side="right"). Ranks
+    # of n objects are close to 1..n, so the cut point is first guessed from
+    # p * n and the binary search is only run if the guess is wrong (which
+    # happens when there are ties around it). The first and last cut points
+    # are always 0 and n, since normalized ranks are in (0, 1].
+    cut_points = np.empty(k + 1, dtype=np.int64)
+    cut_points[0] = 0
+    cut_points[k] = n
+    for i in range(1, k):
+        p = (1.0 / k) * i
+
+        c = min(max(int(p * n), 0), n)
+        if (c > 0 and data_perc_sorted[c - 1] > p) or (
+            c < n and data_perc_sorted[c] <= p
+        ):
+            c = np.searchsorted(data_perc_sorted, p, side="right")
+
+        cut_points[i] = c
+
+    # cut points span all objects, so every element of part is assigned
+    part = np.empty(data_sorted.shape, dtype=np.int16)
+
+    for i in range(k):
+        part[data_sorted[cut_points[i] : cut_points[i + 1]]] = i
+
+    return part
+
+
 @njit(cache=True, nogil=True)
 def run_quantile_clustering(data: NDArray, k: int) -> NDArray[np.int16]:
     """
@@ -52,23 +138,121 @@ def run_quantile_clustering(data: NDArray, k: int) -> NDArray[np.int16]:
     Returns:
         A 1d array with the data partition.
     """
-    data_sorted = np.argsort(data, kind="quicksort")
-    data_rank = rank(data, data_sorted)
-    data_perc = data_rank / len(data)
+    data_sorted, data_perc_sorted = get_quantile_ranks(data)
+    return assign_quantile_clusters(data_sorted, data_perc_sorted, k)
+
 
-    percentiles = [0.0] + get_perc_from_k(k) + [1.0]
+@njit(cache=True, nogil=True)
+def get_rank_counts(data: NDArray, value: float) -> tuple[int, int]:
+    """
+    It returns the number of elements in data that are smaller than and equal
+    to the given value.
+
+    Args:
+        data: a 1d numpy array with numerical values.
+        value: the value to compare with.
+
+    Returns:
+        A tuple with two elements: the number of elements smaller than value,
+        and the number of elements equal to value.
+    """
+    n_smaller = 0
+    n_equal = 0
+    for x in data:
+        if x < value:
+            n_smaller += 1
+        elif x == value:
+            n_equal += 1
+
+    return n_smaller, n_equal
+
+
+@njit(cache=True, nogil=True)
+def get_quantile_threshold(data: NDArray, p: float) -> tuple[bool, float]:
+    """
+    It returns the largest value in data whose normalized rank (see
+    get_quantile_ranks) is less than or equal to the percentile p, without
+    sorting the data. The objects with a normalized rank <= p are then those
+    with a value <= the threshold, which is how run_quantile_clustering
+    splits the data. Ties get the same (average) rank.
+
+    Args:
+        data: a 1d numpy array with numerical values.
+        p: a percentile between 0.0 and 1.0.
+
+    Returns:
+        A tuple with two elements: 1) False if no value has a normalized rank
+        <= p (then no object falls below the threshold), and 2) the threshold.
+    """
+    n = data.shape[0]
+
+    # normalized rank of a group of tied values, computed as in
+    # get_quantile_ranks so that the comparison with p gives the same result
+    def get_perc(n_smaller, n_equal):
+        return (0.5 * (n_smaller + n_equal + n_smaller + 1)) / n
 
-    cut_points = np.searchsorted(data_perc[data_sorted], percentiles, side="right")
+    # with no ties, the threshold is the value at position int(p * n) - 1 in
+    # sorted order; with ties, it is in the same or in an adjacent group of
+    # tied values, which are checked below
+    g = min(max(int(p * n), 1), n)
+    value = np.partition(data, g - 1)[g - 1]
+    n_smaller, n_equal = get_rank_counts(data, value)
 
-    current_cluster = 0
-    part = np.zeros(data.shape, dtype=np.int16) - 1
+    if get_perc(n_smaller, n_equal) <= p:
+        # move to the next group of tied values while they are below p
+        while n_smaller + n_equal < n:
+            next_value = np.inf
+            for x in data:
+                if value < x < next_value:
+                    next_value = x
 
-    for i in range(len(cut_points) - 1):
-        lim1 = cut_points[i]
-        lim2 = cut_points[i + 1]
+            next_n_smaller, next_n_equal = get_rank_counts(data, next_value)
+            if get_perc(next_n_smaller, next_n_equal) > p:
+                break
 
-        part[data_sorted[lim1:lim2]] = current_cluster
-        current_cluster += 1
+            value, n_smaller, n_equal = next_value, next_n_smaller, next_n_equal
+
+        return True, value
+
+    # move to the previous group of tied values until one is below p
+    while n_smaller > 0:
+        prev_value = -np.inf
+        for x in data:
+            if prev_value < x < value:
+                prev_value = x
+
+        value = prev_value
+        n_smaller, n_equal = get_rank_counts(data, value)
+        if get_perc(n_smaller, n_equal) <= p:
+            return True, value
+
+    return False, value
+
+
+@njit(cache=True, nogil=True)
+def run_quantile_clustering_by_partition(data: NDArray, k: int) -> NDArray[np.int16]:
+    """
+    Same as run_quantile_clustering, but the data is not sorted. Instead, the
+    threshold value of each quantile is found with a partial sort (see
+    get_quantile_threshold), which takes linear time. This is faster than
+    sorting when there are only a few quantiles and many objects.
+
+    Args:
+        data: a 1d numpy array with numerical values.
+        k: the number of clusters to split the data into.
+
+    Returns:
+        A 1d array with the data partition.
+    """
+    part = np.zeros(data.shape, dtype=np.int16)
+
+    # the cluster of each object is the number of quantiles below it
+    for i in range(1, k):
+        has_threshold, threshold = get_quantile_threshold(data, (1.0 / k) * i)
+
+        for s in range(data.shape[0]):
+            if not has_threshold or data[s] > threshold:
+                part[s] += 1
 
     return part
 
@@ -136,13 +320,32 @@ def get_parts(
     parts = np.zeros((len(range_n_clusters), data.shape[0]), dtype=np.int16) - 1
 
     if data_is_numerical:
+        # the data is sorted only once for all k values, unless there are few
+        # quantiles to find (each one takes a few linear passes over the data
+        # with run_quantile_clustering_by_partition) compared to the cost of
+        # sorting
+        n_quantiles = 0
+        for k in range_n_clusters:
+            n_quantiles += k - 1
+        sort_data = n_quantiles * 4 >= np.log2(data.shape[0])
+
+        if sort_data:
+            data_sorted, data_perc_sorted = get_quantile_ranks(data)
+
         for idx in range(len(range_n_clusters)):
             k = range_n_clusters[idx]
-            parts[idx] = run_quantile_clustering(data, k)
+            if sort_data:
+                parts[idx] = assign_quantile_clusters(
+                    data_sorted, data_perc_sorted, k
+                )
+            else:
+                parts[idx] = run_quantile_clustering_by_partition(data, k)
 
-        # remove singletons by putting a -2 as values
-        partitions_ks = np.array([len(np.unique(p)) for p in parts])
-        parts[partitions_ks == 1, :] = -2
+            # remove singletons by putting a -2 as values. A partition has
+            # one cluster if all its labels are the same (labels could be
+            # non-consecutive, so checking for max == 0 is not enough)
+            if parts[idx].max() == parts[idx].min():
+                parts[idx] = -2
     else:
         # if the data is categorical, then the encoded feature is already the partition
         # only the first partition is filled, the rest will be -1 (missing)
@@ -151,48 +354,226 @@ def get_parts(
     return parts
 
 
-def get_feature_parts(params):
+@njit(cache=True, nogil=True, parallel=True)
+def get_feature_parts(
+    X: NDArray,
+    X_numerical_type: NDArray[bool],
+    range_n_clusters: NDArray[np.uint16],
+    parts_dtype=np.int16,
+) -> tuple[NDArray[np.int16], NDArray[bool]]:
+    """
+    It computes the partitions for each feature (row) in X. The goal of this
+    function is to parallelize the partitioning step (get_parts function)
+    across features.
+
+    Args:
+        X: a 2d array with features in rows and objects in columns.
+        X_numerical_type: a 1d boolean array indicating whether each feature
+            is numerical (True) or categorical (False).
+        range_n_clusters: a 1d array with the number of clusters (k).
+        parts_dtype: the integer type of the returned partitions. A type
+            smaller than np.int16 (such as np.int8) can only be used if all
+            cluster labels fit in it.
+
+    Returns:
+        A tuple with two elements: 1) a 3d array with shape (n_features,
+        number of clusters, n_objects) with the partitions for each feature
+        and number of clusters, and 2) a 1d boolean array indicating whether
+        each feature is valid, which is False when its partitions were marked
+        as singletons (see get_parts) and the coefficient is not defined.
+    """
+    n_features = X.shape[0]
+
+    # layout is (n_features, n_k, n_objects) in C order: the partitions of a
+    # feature (parts[i]) are one contiguous block, and each partition is a
+    # contiguous row, so the contingency loop in compute_ari reads objects
+    # sequentially. All rows are written by get_parts, so no initialization
+    # is needed.
+    parts = np.empty(
+        (n_features, range_n_clusters.shape[0], X.shape[1]), dtype=parts_dtype
+    )
+    features_valid = np.empty(n_features, dtype=np.bool_)
+
+    for f_idx in prange(n_features):
+        parts[f_idx] = get_parts(X[f_idx], range_n_clusters, X_numerical_type[f_idx])
+        features_valid[f_idx] = parts[f_idx, 0, 0] != -2
+
+    return parts, features_valid
+
+
+@njit(cache=True, nogil=True)
+def get_feature_parts_sequential(
+    X: NDArray,
+    X_numerical_type: NDArray[bool],
+    range_n_clusters: NDArray[np.uint16],
+    parts_dtype=np.int16,
+) -> tuple[NDArray[np.int16], NDArray[bool]]:
+    """
+    Same as get_feature_parts, but features are processed sequentially. This
+    avoids the overhead of numba's parallel runtime when only one thread is
+    used.
+    """
+    n_features = X.shape[0]
+
+    # see get_feature_parts for the layout of parts
+    parts = np.empty(
+        (n_features, range_n_clusters.shape[0], X.shape[1]), dtype=parts_dtype
+    )
+    features_valid = np.empty(n_features, dtype=np.bool_)
+
+    for f_idx in range(n_features):
+        parts[f_idx] = get_parts(X[f_idx], range_n_clusters, X_numerical_type[f_idx])
+        features_valid[f_idx] = parts[f_idx, 0, 0] != -2
+
+    return parts, features_valid
+
+
+def get_parts_ids(parts: NDArray) -> NDArray[np.int64]:
+    """
+    Given the partitions of all features, it assigns an id to each partition,
+    so that identical partitions (across all features and k values) share
+    the same id. These ids are used to avoid computing the ARI between the
+    same pair of partitions more than once (see cdist_parts_cached).
+
+    Args:
+        parts: a 3d array with the partitions for each feature, with shape
+            (n_features, number of partitions, n_objects).
+
+    Returns:
+        A 2d array with shape (n_features, number of partitions) where each
+        element is the id of the corresponding partition in parts.
+    """
+    n_features, n_parts, n_objects = parts.shape
+    flat_parts = np.ascontiguousarray(parts).reshape(n_features * n_parts, n_objects)
+
+    # hashing the raw bytes of each partition is much faster than
+    # np.unique(..., axis=0) when partitions are long
+    unique_parts = {}
+    parts_ids = np.empty(flat_parts.shape[0], dtype=np.int64)
+    for p_idx in range(flat_parts.shape[0]):
+        parts_ids[p_idx] = unique_parts.setdefault(
+            flat_parts[p_idx].tobytes(), len(unique_parts)
+        )
+
+    return parts_ids.reshape(n_features, n_parts)
+
+
+@njit(cache=True, nogil=True)
+def get_parts_stats(parts: NDArray) -> tuple[NDArray[np.int64], NDArray[np.int64]]:
     """
-    Given a list of parameters, it returns the partitions for each feature. The goal
-    of this function is to parallelize the partitioning step (get_parts function).
+    For each partition, it returns the number of cluster labels (the maximum
+    label plus one) and the sum of the squared cluster sizes. These values are
+    needed to compute the ARI between two partitions (see compute_ari), and
+    since they depend on each partition only, they are computed once instead
+    of for each pair of partitions.
 
     Args:
-        params: a list of tuples with three elements: 1) a tuple with the feature
-            index, the cluster index and the number of clusters (k), 2) the data for the
-            feature, and 3) a boolean indicating whether the feature is numerical or not.
+        parts: a 2d array with clustering partitions in rows and objects in
+          columns. Partitions with negative values (see get_parts) are
+          skipped.
 
     Returns:
-        A 2d array with the partitions (rows) for the selected features and number of
-        clusters.
-    """
-    n_objects = params[0][1].shape[0]
-    parts = np.zeros((len(params), n_objects), dtype=np.int16) - 1
-
-    # iterate over a list of tuples that indicate a feature-k pair
-    for p_idx, p in enumerate(params):
-        # the first element is a tuple with the feature index, the cluster index and the
-        # number of clusters (k)
-        info = p[0]
-        # f_idx = info[0]
-        c_idx = info[1]
-        c = info[2]
-        range_n_clusters = np.array([c], dtype=np.uint16)
-
-        # the second element is the data for the feature
-        data = p[1]
-
-        # the third element is a boolean indicating whether the feature is numerical
-        numerical_data_type = p[2]
-
-        # if the feature is categorical, then only the first partition is filled
-        if not numerical_data_type and c_idx > 0:
+        A tuple with two 1d arrays: 1) the number of cluster labels of each
+        partition, and 2) the sum of the squared cluster sizes of each
+        partition. Both values are zero for skipped partitions.
+    """
+    n_parts, n_objects = parts.shape
+    parts_k = np.zeros(n_parts, dtype=np.int64)
+    parts_sum_squares = np.zeros(n_parts, dtype=np.int64)
+
+    for i in range(n_parts):
+        if parts[i, 0] < 0:
             continue
 
-        parts[p_idx] = get_parts(data, range_n_clusters, numerical_data_type)
+        k = parts[i].max() + 1
+        cluster_sizes = np.zeros(k, dtype=np.int64)
+        for s in range(n_objects):
+            cluster_sizes[parts[i, s]] += 1
 
-    return parts
+        parts_k[i] = k
+        parts_sum_squares[i] = (cluster_sizes * cluster_sizes).sum()
+
+    return parts_k, parts_sum_squares
+
+
+@njit(cache=True, nogil=True)
+def get_features_parts_stats(
+    parts: NDArray,
+) -> tuple[NDArray[np.int64], NDArray[np.int64]]:
+    """
+    Same as get_parts_stats, but for the partitions of all features.
 
+    Args:
+        parts: a 3d array with the partitions for each feature (see
+            get_feature_parts).
+
+    Returns:
+        A tuple with two 2d arrays with shape (n_features, number of
+        partitions) (see get_parts_stats).
+    """
+    n_features, n_parts, n_objects = parts.shape
+    parts_k, parts_sum_squares = get_parts_stats(
+        parts.reshape((n_features * n_parts, n_objects))
+    )
+
+    return (
+        parts_k.reshape((n_features, n_parts)),
+        parts_sum_squares.reshape((n_features, n_parts)),
+    )
+
+
+@njit(cache=True, nogil=True)
+def compute_ari(
+    part0: NDArray,
+    part1: NDArray,
+    k0: int,
+    k1: int,
+    sum_squares0: int,
+    sum_squares1: int,
+    cont_buffer: NDArray[np.int64],
+) -> float:
+    """
+    Computes the adjusted Rand index (ARI) between two clustering partitions.
+    It returns the same value as adjusted_rand_index, but the contingency
+    matrix is built on a buffer that is reused across calls, and the
+    statistics that depend on each partition only are given as arguments (see
+    get_parts_stats).
+
+    Args:
+        part0: a 1d array with cluster assignments for n objects.
+        part1: a 1d array with cluster assignments for n objects.
+        k0: number of cluster labels in part0.
+        k1: number of cluster labels in part1.
+        sum_squares0: sum of the squared cluster sizes of part0.
+        sum_squares1: sum of the squared cluster sizes of part1.
+        cont_buffer: a 2d array with at least k0 rows and k1 columns, used to
+          build the contingency matrix. Its content is overwritten.
+
+    Returns:
+        The adjusted Rand index between part0 and part1.
+    """
+    n_objects = part0.shape[0]
+
+    cont_mat = cont_buffer[:k0, :k1]
+    cont_mat[:] = 0
+    for s in range(n_objects):
+        cont_mat[part0[s], part1[s]] += 1
+
+    sum_squares = 0
+    for a in range(k0):
+        for b in range(k1):
+            sum_squares += cont_mat[a, b] * cont_mat[a, b]
+
+    # pair confusion matrix (see get_pair_confusion_matrix)
+    tp = sum_squares - n_objects
+    fp = sum_squares1 - sum_squares
+    fn = sum_squares0 - sum_squares
+    tn = n_objects * n_objects - fp - fn - sum_squares
+
+    return get_adjusted_rand_index_from_pair_counts(tn, fp, fn, tp)
 
+
+@njit(cache=True, nogil=True)
 def cdist_parts_basic(x: NDArray, y: NDArray) -> NDArray[float]:
     """
     It implements the same functionality in scipy.spatial.distance.cdist but
@@ -218,6 +599,10 @@ def cdist_parts_basic(x: NDArray, y: NDArray) -> NDArray[float]:
     """
     res = np.zeros((x.shape[0], y.shape[0]))
 
+    x_k, x_sum_squares = get_parts_stats(x)
+    y_k, y_sum_squares = get_parts_stats(y)
+    cont_buffer = np.empty((x_k.max(), y_k.max()), dtype=np.int64)
+
     for i in range(res.shape[0]):
         if x[i, 0] < 0:
             continue
@@ -226,37 +611,252 @@ def cdist_parts_basic(x: NDArray, y: NDArray) -> NDArray[float]:
             if y[j, 0] < 0:
                 continue
 
-            res[i, j] = ari(x[i], y[j])
+            res[i, j] = compute_ari(
+                x[i],
+                y[j],
+                x_k[i],
+                y_k[j],
+                x_sum_squares[i],
+                y_sum_squares[j],
+                cont_buffer,
+            )
 
     return res
 
 
-def cdist_parts_parallel(
-    x: NDArray, y: NDArray, executor: ThreadPoolExecutor
+@njit(cache=True, nogil=True)
+def cdist_parts_cached(
+    x: NDArray, y: NDArray, x_ids: NDArray, y_ids: NDArray, ari_cache: NDArray
 ) -> NDArray[float]:
     """
-    It parallelizes cdist_parts_basic function.
+    Same as cdist_parts_basic, but it keeps the ARI values already computed
+    in a cache. Partitions are identified by an id (see get_parts_ids), so
+    identical partitions (even if they belong to different objects) share
+    the same id and the ARI between them is computed only once.
 
     Args:
         x: same as in cdist_parts_basic
         y: same as in cdist_parts_basic
-        executor: a pool executor where jobs will be submitted.
+        x_ids: a 1d array with the ids of the partitions in x.
+        y_ids: a 1d array with the ids of the partitions in y.
+        ari_cache: a 2d square array with the ARI between each pair of
+            partition ids (only the entry with the smallest id first is used,
+            since the ARI is symmetric), or NaN if it was not computed yet. It
+            is updated with the values computed in this call. If the array is
+            empty, no cache is used.
 
-    Results:
+    Returns:
         Same as in cdist_parts_basic.
     """
+    if ari_cache.shape[0] == 0:
+        return cdist_parts_basic(x, y)
+
     res = np.zeros((x.shape[0], y.shape[0]))
 
-    inputs = get_chunks(res.shape[0], executor._max_workers, 1)
+    x_k, x_sum_squares = get_parts_stats(x)
+    y_k, y_sum_squares = get_parts_stats(y)
+    cont_buffer = np.empty((x_k.max(), y_k.max()), dtype=np.int64)
+
+    for i in range(res.shape[0]):
+        if x[i, 0] < 0:
+            continue
+
+        for j in range(res.shape[1]):
+            if y[j, 0] < 0:
+                continue
 
-    tasks = {executor.submit(cdist_parts_basic, x[idxs], y): idxs for idxs in inputs}
-    for t in as_completed(tasks):
-        idx = tasks[t]
-        res[idx, :] = t.result()
+            res[i, j] = get_ari_cached(
+                x[i],
+                y[j],
+                x_ids[i],
+                y_ids[j],
+                x_k[i],
+                y_k[j],
+                x_sum_squares[i],
+                y_sum_squares[j],
+                ari_cache,
+                cont_buffer,
+            )
 
     return res
 
 
+@njit(cache=True, nogil=True)
+def get_ari_cached(
+    part0: NDArray,
+    part1: NDArray,
+    id0: int,
+    id1: int,
+    k0: int,
+    k1: int,
+    sum_squares0: int,
+    sum_squares1: int,
+    ari_cache: NDArray,
+    cont_buffer: NDArray[np.int64],
+) -> float:
+    """
+    It returns the ARI between two partitions (see compute_ari), reading it
+    from the cache of ARI values if it was already computed (see
+    cdist_parts_cached).
+
+    Args:
+        part0: a 1d array with cluster assignments for n objects.
+        part1: a 1d array with cluster assignments for n objects.
+        id0: the id of part0 (see get_parts_ids).
+        id1: the id of part1.
+        k0: same as in compute_ari.
+        k1: same as in compute_ari.
+        sum_squares0: same as in compute_ari.
+        sum_squares1: same as in compute_ari.
+        ari_cache: same as in cdist_parts_cached. If the array is empty, no
+          cache is used.
+        cont_buffer: same as in compute_ari.
+
+    Returns:
+        The adjusted Rand index between part0 and part1.
+    """
+    if id0 == id1:
+        return 1.0
+
+    if ari_cache.shape[0] == 0:
+        return compute_ari(
+            part0, part1, k0, k1, sum_squares0, sum_squares1, cont_buffer
+        )
+
+    if id0 > id1:
+        id0, id1 = id1, id0
+
+    # different threads might compute the same missing value at the
+    # same time, but they will write the same result
+    ari_value = ari_cache[id0, id1]
+    if np.isnan(ari_value):
+        ari_value = compute_ari(
+            part0, part1, k0, k1, sum_squares0, sum_squares1, cont_buffer
+        )
+        ari_cache[id0, id1] = ari_value
+
+    return ari_value
+
+
+@njit(cache=True, nogil=True)
+def get_ari_upper_bound(
+    n_objects: int, sum_squares0: int, sum_squares1: int
+) -> float:
+    """
+    It returns an upper bound of the ARI between two partitions that only
+    depends on the size of their clusters (see get_parts_stats). With the
+    cluster sizes fixed, the ARI only increases with the sum of the squared
+    values of the contingency matrix (see compute_ari), which is at most the
+    sum of the squared cluster sizes of either partition. The bound is the ARI
+    computed with that maximum.
+
+    Args:
+        n_objects: the number of objects in the partitions.
+        sum_squares0: sum of the squared cluster sizes of one partition.
+        sum_squares1: sum of the squared cluster sizes of the other partition.
+
+    Returns:
+        An upper bound of the ARI between the two partitions.
+    """
+    sum_squares = min(sum_squares0, sum_squares1)
+
+    # pair confusion matrix (see compute_ari)
+    tp = sum_squares - n_objects
+    fp = sum_squares1 - sum_squares
+    fn = sum_squares0 - sum_squares
+    tn = n_objects * n_objects - fp - fn - sum_squares
+
+    return get_adjusted_rand_index_from_pair_counts(tn, fp, fn, tp)
+
+
+@njit(cache=True, nogil=True)
+def get_max_ari(
+    x: NDArray,
+    y: NDArray,
+    x_ids: NDArray,
+    y_ids: NDArray,
+    x_k: NDArray,
+    y_k: NDArray,
+    x_sum_squares: NDArray,
+    y_sum_squares: NDArray,
+    ari_cache: NDArray,
+    cont_buffer: NDArray[np.int64],
+) -> tuple[float, tuple[int]]:
+    """
+    It returns the same result as get_ccc_from_cdist(cdist_parts_cached(x,
+    y, ...)), but without computing the ARI between all partition pairs.
+    Partition pairs with the same index (that usually have the same number of
+    clusters) are compared first, and the rest of the pairs are skipped if
+    their ARI upper bound (see get_ari_upper_bound) is below the maximum ARI
+    found so far.
+
+    Args:
+        x: same as in cdist_parts_basic.
+        y: same as in cdist_parts_basic.
+        x_ids: same as in cdist_parts_cached.
+        y_ids: same as in cdist_parts_cached.
+        x_k: the number of cluster labels of each partition in x (see
+          get_parts_stats).
+        y_k: same as x_k, for y.
+        x_sum_squares: the sum of the squared cluster sizes of each partition
+          in x (see get_parts_stats).
+        y_sum_squares: same as x_sum_squares, for y.
+        ari_cache: same as in cdist_parts_cached.
+        cont_buffer: same as in compute_ari, with enough rows and columns for
+          all partitions in x and y.
+
+    Returns:
+        Same as get_ccc_from_cdist.
+    """
+    n_x, n_y = x.shape[0], y.shape[0]
+    n_objects = x.shape[1]
+
+    max_ari = -np.inf
+    max_flat_idx = 0
+
+    for step in range(2):
+        for i in range(n_x):
+            for j in range(n_y):
+                # the first step compares partitions with the same index only
+                if (step == 0) != (i == j):
+                    continue
+
+                if x[i, 0] < 0 or y[j, 0] < 0:
+                    # same as cdist_parts_basic
+                    ari_value = 0.0
+                else:
+                    # the tolerance accounts for floating point errors, so
+                    # skipped pairs can never be the maximum
+                    upper_bound = get_ari_upper_bound(
+                        n_objects, x_sum_squares[i], y_sum_squares[j]
+                    )
+                    if upper_bound < max_ari - ARI_UPPER_BOUND_TOLERANCE:
+                        continue
+
+                    ari_value = get_ari_cached(
+                        x[i],
+                        y[j],
+                        x_ids[i],
+                        y_ids[j],
+                        x_k[i],
+                        y_k[j],
+                        x_sum_squares[i],
+                        y_sum_squares[j],
+                        ari_cache,
+                        cont_buffer,
+                    )
+
+                # keep the first maximum in row-major order, as argmax does
+                flat_idx = i * n_y + j
+                if ari_value > max_ari or (
+                    ari_value == max_ari and flat_idx < max_flat_idx
+                ):
+                    max_ari = ari_value
+                    max_flat_idx = flat_idx
+
+    return max(max_ari, 0.0), (max_flat_idx // n_y, max_flat_idx % n_y)
+
+
 @njit(cache=True, nogil=True)
 def get_coords_from_index(n_obj: int, idx: int) -> tuple[int]:
     """
@@ -276,9 +876,18 @@ def get_coords_from_index(n_obj: int, idx: int) -> tuple[int]:
         equivalent to the condensed array.
     """
     b = 1 - 2 * n_obj
-    x = np.floor((-b - np.sqrt(b**2 - 8 * idx)) / 2)
-    y = idx + x * (b + x + 2) / 2 + 1
-    return int(x), int(y)
+    x = int(np.floor((-b - np.sqrt(b**2 - 8 * idx)) / 2))
+
+    # the square root above can be off by one for large indexes due to
+    # floating point rounding, so the row is fixed using integer arithmetic
+    # (index of the first element of row x is x * (2 * n_obj - x - 1) / 2)
+    while x > 0 and x * (2 * n_obj - x - 1) // 2 > idx:
+        x -= 1
+    while (x + 1) * (2 * n_obj - x - 2) // 2 <= idx:
+        x += 1
+
+    y = idx - x * (2 * n_obj - x - 1) // 2 + x + 1
+    return x, y
 
 
 def get_chunks(
@@ -346,7 +955,28 @@ def get_feature_type_and_encode(feature_data: NDArray) -> tuple[NDArray, bool]:
     return np.unique(feature_data, return_inverse=True)[1], data_type_is_numerical
 
 
-def compute_ccc(obj_parts_i: NDArray, obj_parts_j: NDArray, cdist_func):
+@njit(cache=True, nogil=True)
+def get_ccc_from_cdist(comp_values: NDArray) -> tuple[float, tuple[int]]:
+    """
+    Given the ARI values between all partitions of two features (see
+    cdist_parts_basic), it returns the CCC coefficient.
+
+    Args:
+        comp_values: a 2d array with the ARI values between the partitions of
+            one feature (rows) and the partitions of another feature (columns).
+
+    Returns:
+        A tuple with two elements: 1) the CCC coefficient, and 2) the indexes
+        of the partitions that maximized the coefficient.
+    """
+    max_flat_idx = comp_values.argmax()
+    max_idx = unravel_index_2d(max_flat_idx, comp_values.shape)
+
+    return max(comp_values[max_idx], 0.0), max_idx
+
+
+@njit(cache=True, nogil=True)
+def compute_ccc(obj_parts_i: NDArray, obj_parts_j: NDArray):
     """
     Given a set of partitions for two features, it computes the CCC coefficient.
 
@@ -355,21 +985,12 @@ def compute_ccc(obj_parts_i: NDArray, obj_parts_j: NDArray, cdist_func):
             partition, and each column is an object.
         obj_parts_j: a 2d array with partitions for another feature. Each row is
             a partition, and each column is an object.
-        cdist_func: a function that computes the distance between partitions. It
-            can be either cdist_parts_basic or cdist_parts_parallel.
 
     Returns:
         A tuple with two elements: 1) the CCC coefficient, and 2) the indexes
         of the partitions that maximized the coefficient.
     """
-    comp_values = cdist_func(
-        obj_parts_i,
-        obj_parts_j,
-    )
-    max_flat_idx = comp_values.argmax()
-    max_idx = unravel_index_2d(max_flat_idx, comp_values.shape)
-
-    return max(comp_values[max_idx], 0.0), max_idx
+    return get_ccc_from_cdist(cdist_parts_basic(obj_parts_i, obj_parts_j))
 
 
 def compute_ccc_perms(params) -> NDArray[float]:
@@ -404,117 +1025,385 @@ def compute_ccc_perms(params) -> NDArray[float]:
             obj_parts_j_permuted[it] = obj_parts_j[it][perm_idx]
 
         # compute the CCC using the permuted partitions
-        ccc_perm_values[idx] = compute_ccc(
-            obj_parts_i, obj_parts_j_permuted, cdist_parts_basic
-        )[0]
+        ccc_perm_values[idx] = compute_ccc(obj_parts_i, obj_parts_j_permuted)[0]
 
     return ccc_perm_values
 
 
-def compute_coef(params):
+@njit(cache=True, nogil=True)
+def compute_coef_tile(
+    i0: int,
+    i1: int,
+    j0: int,
+    j1: int,
+    parts: NDArray,
+    features_valid: NDArray[bool],
+    parts_ids: NDArray,
+    parts_k: NDArray[np.int64],
+    parts_sum_squares: NDArray[np.int64],
+    ari_cache: NDArray,
+    max_ari_list: NDArray[float],
+    max_part_idx_list: NDArray[np.uint64],
+    out_matrix: NDArray[float],
+):
+    """
+    It computes the CCC coefficient between features i in [i0, i1) and
+    features j in [j0, j1), with j > i (a tile of the upper triangle of the
+    pairwise matrix), and writes the results into the given condensed arrays
+    (see compute_coef).
+
+    Args:
+        i0: the first feature index of the tile rows.
+        i1: the last feature index (exclusive) of the tile rows.
+        j0: the first feature index of the tile columns.
+        j1: the last feature index (exclusive) of the tile columns.
+        parts: a 3d array with the partitions for each feature (see
+            get_feature_parts).
+        features_valid: a 1d boolean array indicating whether each feature
+            is valid (see get_feature_parts). Pairs with an invalid feature
+            are skipped.
+        parts_ids: a 2d array with the ids of the partitions for each
+            feature (see get_parts_ids).
+        parts_k: a 2d array with the number of cluster labels of the
+            partitions of each feature (see get_parts_stats).
+        parts_sum_squares: a 2d array with the sum of the squared cluster
+            sizes of the partitions of each feature (see get_parts_stats).
+        ari_cache: a 2d array used as a cache of ARI values between
+            partitions (see cdist_parts_cached).
+        max_ari_list: the condensed 1d array with CCC values (output). It is
+            not used if out_matrix is given.
+        max_part_idx_list: the condensed 2d array with the indexes of the
+            partitions that maximized the coefficient (output). It is not
+            used if it is empty.
+        out_matrix: a 2d square array where CCC values are written for each
+            feature pair (i, j) and (j, i) (output). It is not used if it is
+            empty.
+    """
+    n_features = parts.shape[0]
+
+    # buffer to build contingency matrices, shared by all pairs in the tile
+    k_max = parts_k.max()
+    cont_buffer = np.empty((k_max, k_max), dtype=np.int64)
+
+    for i in range(i0, i1):
+        # partitions of feature i are kept across the loop below, and only
+        # the partitions of feature j are loaded for each pair.
+        obji_parts = parts[i]
+
+        # index of pair (i, i + 1) in the condensed array
+        row_start_idx = i * (2 * n_features - i - 1) // 2
+
+        for j in range(max(j0, i + 1), j1):
+            idx = row_start_idx + (j - i - 1)
+
+            # compute ari only if partitions are valid (not marked as
+            # singletons, which happens when partitions have one cluster,
+            # usually when all data in the feature has the same value).
+            if features_valid[i] and features_valid[j]:
+                objj_parts = parts[j]
+
+                # compare all partitions of one object to the all the
+                # partitions of the other object, and get the maximium ARI
+                max_ari, max_idx = get_max_ari(
+                    obji_parts,
+                    objj_parts,
+                    parts_ids[i],
+                    parts_ids[j],
+                    parts_k[i],
+                    parts_k[j],
+                    parts_sum_squares[i],
+                    parts_sum_squares[j],
+                    ari_cache,
+                    cont_buffer,
+                )
+
+                if max_part_idx_list.shape[0] > 0:
+                    max_part_idx_list[idx, 0] = max_idx[0]
+                    max_part_idx_list[idx, 1] = max_idx[1]
+            else:
+                max_ari = np.nan
+
+            if out_matrix.shape[0] > 0:
+                out_matrix[i, j] = max_ari
+                out_matrix[j, i] = max_ari
+            else:
+                max_ari_list[idx] = max_ari
+
+
+@njit(cache=True, nogil=True)
+def compute_coef_block_row(
+    block_idx: int,
+    parts: NDArray,
+    features_valid: NDArray[bool],
+    parts_ids: NDArray,
+    parts_k: NDArray[np.int64],
+    parts_sum_squares: NDArray[np.int64],
+    ari_cache: NDArray,
+    max_ari_list: NDArray[float],
+    max_part_idx_list: NDArray[np.uint64],
+    out_matrix: NDArray[float],
+):
+    """
+    It computes the CCC coefficient for all pairs in a block row of the upper
+    triangle of the pairwise matrix, which has the features
+    [block_idx * COEF_TILE_SIZE, (block_idx + 1) * COEF_TILE_SIZE) as rows.
+    The block row is processed in square tiles (see compute_coef_tile), so
+    the partitions of the features in a tile are reused while they are in
+    the CPU cache.
+
+    Args:
+        block_idx: the index of the block row.
+        parts: a 3d array with the partitions for each feature (see
+            get_feature_parts).
+        features_valid: a 1d boolean array indicating whether each feature
+            is valid (see get_feature_parts). Pairs with an invalid feature
+            are skipped.
+        parts_ids: a 2d array with the ids of the partitions for each
+            feature (see get_parts_ids).
+        parts_k: a 2d array with the number of cluster labels of the
+            partitions of each feature (see get_parts_stats).
+        parts_sum_squares: a 2d array with the sum of the squared cluster
+            sizes of the partitions of each feature (see get_parts_stats).
+        ari_cache: a 2d array used as a cache of ARI values between
+            partitions (see cdist_parts_cached).
+        max_ari_list: the condensed 1d array with CCC values (output). It is
+            not used if out_matrix is given.
+        max_part_idx_list: the condensed 2d array with the indexes of the
+            partitions that maximized the coefficient (output). It is not
+            used if it is empty.
+        out_matrix: a 2d square array where CCC values are written for each
+            feature pair (i, j) and (j, i) (output). It is not used if it is
+            empty.
+    """
+    n_features = parts.shape[0]
+
+    i0 = block_idx * COEF_TILE_SIZE
+    i1 = min(i0 + COEF_TILE_SIZE, n_features)
+
+    for j0 in range(i0, n_features, COEF_TILE_SIZE):
+        j1 = min(j0 + COEF_TILE_SIZE, n_features)
+        compute_coef_tile(
+            i0,
+            i1,
+            j0,
+            j1,
+            parts,
+            features_valid,
+            parts_ids,
+            parts_k,
+            parts_sum_squares,
+            ari_cache,
+            max_ari_list,
+            max_part_idx_list,
+            out_matrix,
+        )
+
+
+@njit(cache=True, nogil=True, parallel=True)
+def compute_coef(
+    parts: NDArray,
+    features_valid: NDArray[bool],
+    parts_ids: NDArray,
+    ari_cache: NDArray,
+    out_matrix: NDArray[float],
+) -> tuple[NDArray[float], NDArray[np.uint64]]:
+    """
+    Given the partitions of all features, it computes the CCC coefficient for
+    each pair of features. Block rows of the upper triangle of the pairwise
+    matrix are processed in parallel (see compute_coef_block_row).
+
+    Args:
+        parts: a 3d array with the partitions for each feature (see
+            get_feature_parts).
+        features_valid: a 1d boolean array indicating whether each feature
+            is valid (see get_feature_parts). Pairs with an invalid feature
+            are skipped.
+        parts_ids: a 2d array with the ids of the partitions for each
+            feature (see get_parts_ids).
+        ari_cache: a 2d array used as a cache of ARI values between
+            partitions (see cdist_parts_cached).
+        out_matrix: an optional 2d square array (n_features, n_features)
+            where the CCC values are written (the diagonal is not modified).
+            If it is empty, the condensed arrays are returned instead.
+
+    Returns:
+        Returns a tuple with two arrays. The first array has the CCC
+        coefficients (a condensed 1d array with all feature pairs), and the
+        second array has the indexes of the partitions that maximized the
+        coefficient. Both arrays are empty if out_matrix is given.
+    """
+    n_features = parts.shape[0]
+    n_features_comp = (n_features * (n_features - 1)) // 2
+
+    # if the square output matrix is given, condensed arrays are not needed
+    if out_matrix.shape[0] > 0:
+        n_features_comp = 0
+
+    max_ari_list = np.full(n_features_comp, np.nan)
+    max_part_idx_list = np.zeros((n_features_comp, 2), dtype=np.uint64)
+
+    parts_k, parts_sum_squares = get_features_parts_stats(parts)
+
+    # block rows get shorter as the block index increases, so each parallel
+    # iteration processes a short and a long block row (b and n_blocks - 1 - b)
+    # to balance the work
+    n_blocks = (n_features + COEF_TILE_SIZE - 1) // COEF_TILE_SIZE
+    for b in prange((n_blocks + 1) // 2):
+        compute_coef_block_row(
+            b,
+            parts,
+            features_valid,
+            parts_ids,
+            parts_k,
+            parts_sum_squares,
+            ari_cache,
+            max_ari_list,
+            max_part_idx_list,
+            out_matrix,
+        )
+
+        b_paired = n_blocks - 1 - b
+        if b_paired != b:
+            compute_coef_block_row(
+                b_paired,
+                parts,
+                features_valid,
+                parts_ids,
+                parts_k,
+                parts_sum_squares,
+                ari_cache,
+                max_ari_list,
+                max_part_idx_list,
+                out_matrix,
+            )
+
+    return max_ari_list, max_part_idx_list
+
+
+@njit(cache=True, nogil=True)
+def compute_coef_sequential(
+    parts: NDArray,
+    features_valid: NDArray[bool],
+    parts_ids: NDArray,
+    ari_cache: NDArray,
+    out_matrix: NDArray[float],
+) -> tuple[NDArray[float], NDArray[np.uint64]]:
+    """
+    Same as compute_coef, but block rows are processed sequentially. This
+    avoids the overhead of numba's parallel runtime when only one thread is
+    used.
+    """
+    n_features = parts.shape[0]
+    n_features_comp = (n_features * (n_features - 1)) // 2
+
+    # if the square output matrix is given, condensed arrays are not needed
+    if out_matrix.shape[0] > 0:
+        n_features_comp = 0
+
+    max_ari_list = np.full(n_features_comp, np.nan)
+    max_part_idx_list = np.zeros((n_features_comp, 2), dtype=np.uint64)
+
+    parts_k, parts_sum_squares = get_features_parts_stats(parts)
+
+    n_blocks = (n_features + COEF_TILE_SIZE - 1) // COEF_TILE_SIZE
+    for block_idx in range(n_blocks):
+        compute_coef_block_row(
+            block_idx,
+            parts,
+            features_valid,
+            parts_ids,
+            parts_k,
+            parts_sum_squares,
+            ari_cache,
+            max_ari_list,
+            max_part_idx_list,
+            out_matrix,
+        )
+
+    return max_ari_list, max_part_idx_list
+
+
+def compute_pvalues(params) -> NDArray[float]:
     """
     Given a list of indexes representing each a pair of
-    objects/rows/genes, it computes the CCC coefficient for
-    each of them. This function is supposed to be used to parallelize
-    processing.
+    objects/rows/genes, it computes the p-value of the CCC coefficient for
+    each of them using permutations. This function is supposed to be used to
+    parallelize processing.
 
     Args:
         params: a tuple with eight elements: 1) the indexes of the features
             to compare, 2) the number of features, 3) the partitions for each
-            feature, 4) the number of permutations to compute the p-value, 5)
-            the number of threads to use for parallelization, 6) the ratio
-            between the number of chunks and the number of threads, 7) the
-            executor to use for cdist parallelization, and 8) the executor to use
-            for parallelization of permutations.
+            feature, 4) the CCC coefficients of the selected feature pairs, 5)
+            the number of permutations to compute the p-value, 6) the number
+            of threads to use for parallelization, 7) the ratio between the
+            number of chunks and the number of threads, and 8) the executor to
+            use for parallelization of permutations.
 
     Returns:
-        Returns a tuple with three arrays. The first array has the CCC
-        coefficients, the second array has the indexes of the partitions that
-        maximized the coefficient, and the third array has the p-values.
+        Returns an array with the p-values.
     """
     (
         idx_list,
         n_features,
         parts,
+        cm_values,
         pvalue_n_perms,
         default_n_threads,
         n_chunks_threads_ratio,
-        cdist_executor,
         executor,
     ) = params
 
-    cdist_func = cdist_parts_basic
-    if cdist_executor is not False:
-
-        def cdist_func(x, y):
-            return cdist_parts_parallel(x, y, cdist_executor)
-
     n_idxs = len(idx_list)
-    max_ari_list = np.full(n_idxs, np.nan, dtype=float)
-    max_part_idx_list = np.zeros((n_idxs, 2), dtype=np.uint64)
     pvalues = np.full(n_idxs, np.nan, dtype=float)
 
     for idx, data_idx in enumerate(idx_list):
+        # the coefficient is not defined for this pair (see compute_coef)
+        if np.isnan(cm_values[idx]):
+            continue
+
         i, j = get_coords_from_index(n_features, data_idx)
 
-        # get partitions for the pair of objects
+        # get partitions for the pair of objects; since parts is C-contiguous,
+        # these are contiguous (n_k, n_objects) views (no copies)
         obji_parts, objj_parts = parts[i], parts[j]
 
-        # compute ari only if partitions are not marked as "missing"
-        # (negative values), which is assigned when partitions have
-        # one cluster (usually when all data in the feature has the same
-        # value).
-        if obji_parts[0, 0] == -2 or objj_parts[0, 0] == -2:
-            continue
-
-        # compare all partitions of one object to the all the partitions
-        # of the other object, and get the maximium ARI
-        max_ari_list[idx], max_part_idx_list[idx] = compute_ccc(
-            obji_parts, objj_parts, cdist_func
-        )
-
-        # compute p-value if requested
-        if pvalue_n_perms is not None and pvalue_n_perms > 0:
-            # with ThreadPoolExecutor(max_workers=pvalue_n_jobs) as executor_perms:
-            # select the variable that generated more partitions as the one
-            # to permute
-            obj_parts_sel_i = obji_parts
-            obj_parts_sel_j = objj_parts
-            if (obji_parts[:, 0] >= 0).sum() > (objj_parts[:, 0] >= 0).sum():
-                obj_parts_sel_i = objj_parts
-                obj_parts_sel_j = obji_parts
-
-            p_ccc_values = np.full(pvalue_n_perms, np.nan, dtype=float)
-            p_inputs = get_chunks(
-                pvalue_n_perms, default_n_threads, n_chunks_threads_ratio
+        # select the variable that generated more partitions as the one
+        # to permute
+        obj_parts_sel_i = obji_parts
+        obj_parts_sel_j = objj_parts
+        if (obji_parts[:, 0] >= 0).sum() > (objj_parts[:, 0] >= 0).sum():
+            obj_parts_sel_i = objj_parts
+            obj_parts_sel_j = obji_parts
+
+        p_ccc_values = np.full(pvalue_n_perms, np.nan, dtype=float)
+        p_inputs = get_chunks(pvalue_n_perms, default_n_threads, n_chunks_threads_ratio)
+        p_inputs = [
+            (
+                i,
+                obj_parts_sel_i,
+                obj_parts_sel_j,
+                len(i),
             )
-            p_inputs = [
-                (
-                    i,
-                    obj_parts_sel_i,
-                    obj_parts_sel_j,
-                    len(i),
-                )
-                for i in p_inputs
-            ]
+            for i in p_inputs
+        ]
 
-            for params, p_ccc_val in zip(
+        for params, p_ccc_val in zip(
+            p_inputs,
+            executor.map(
+                compute_ccc_perms,
                 p_inputs,
-                executor.map(
-                    compute_ccc_perms,
-                    p_inputs,
-                ),
-            ):
-                p_idx = params[0]
-
-                p_ccc_values[p_idx] = p_ccc_val
-
-            # compute p-value
-            pvalues[idx] = (np.sum(p_ccc_values >= max_ari_list[idx]) + 1) / (
-                pvalue_n_perms + 1
-            )
+            ),
+        ):
+            p_idx = params[0]
+
+            p_ccc_values[p_idx] = p_ccc_val
+
+        # compute p-value
+        pvalues[idx] = (np.sum(p_ccc_values >= cm_values[idx]) + 1) / (
+            pvalue_n_perms + 1
+        )
 
-    return max_ari_list, max_part_idx_list, pvalues
+    return pvalues
 
 
 def get_n_workers(n_jobs: int | None) -> int:
@@ -578,11 +1467,9 @@ def ccc(
           if this expression yields a result less than 1). Default is 1.
         pvalue_n_perms: if given, it computes the p-value of the
             coefficient using the given number of permutations.
-        partitioning_executor: Executor type used for partitioning the data. It
-            can be either "thread" (default) or "process". If "thread", it will use
-            ThreadPoolExecutor for parallelization, which uses less memory. If
-            "process", it will use ProcessPoolExecutor, which might be faster. If
-            anything else, it will not parallelize the partitioning step.
+        partitioning_executor: this parameter is ignored and kept only for
+            backward compatibility. The partitioning step is now parallelized
+            across features with numba using n_jobs threads.
 
 
     Returns:
@@ -667,6 +1554,69 @@ def ccc(
     else:
         raise ValueError("Wrong combination of parameters x and y")
 
+    return ccc_ndarray(
+        X,
+        X_numerical_type,
+        internal_n_clusters=internal_n_clusters,
+        return_parts=return_parts,
+        n_chunks_threads_ratio=n_chunks_threads_ratio,
+        n_jobs=n_jobs,
+        pvalue_n_perms=pvalue_n_perms,
+    )
+
+
+def ccc_ndarray(
+    X: NDArray,
+    X_numerical_type: NDArray[bool] = None,
+    internal_n_clusters: Union[int, Iterable[int]] = None,
+    return_parts: bool = False,
+    n_chunks_threads_ratio: int = 1,
+    n_jobs: int = 1,
+    pvalue_n_perms: int = None,
+    out_matrix: NDArray[float] = None,
+) -> tuple[NDArray[float], NDArray[float], NDArray[np.uint64], NDArray[np.int16]]:
+    """
+    It computes the CCC between all pairs of rows of a 2d numpy array. This is
+    the fast path used by ccc after the input data is validated and encoded,
+    and it can be called directly when the data is already a numerical numpy
+    array with features in rows (for example, to avoid the input checks when
+    computing the coefficient on many small arrays). Input data is not
+    checked.
+
+    Args:
+        X: a 2d numerical numpy array with features in rows and objects in
+          columns. NaN are not supported. Categorical features must be
+          encoded (see get_feature_type_and_encode).
+        X_numerical_type: a 1d boolean array indicating whether each feature
+          is numerical (True) or categorical (False). If None, all features
+          are considered numerical.
+        internal_n_clusters: see ccc.
+        return_parts: see ccc.
+        n_chunks_threads_ratio: see ccc.
+        n_jobs: see ccc.
+        pvalue_n_perms: see ccc.
+        out_matrix: an optional 2d float array with shape (n_features,
+          n_features). If given, the coefficients are written into it as a
+          symmetric matrix instead of a condensed array, which avoids the
+          conversion to a square matrix (its diagonal is not modified). It
+          cannot be used with return_parts or pvalue_n_perms.
+
+    Returns:
+        Same as ccc. If out_matrix is given, it returns out_matrix.
+    """
+    n_features, n_objects = X.shape
+    if X_numerical_type is None:
+        X_numerical_type = np.full((n_features,), True, dtype=bool)
+
+    if out_matrix is not None:
+        if out_matrix.shape != (n_features, n_features):
+            raise ValueError(
+                f"out_matrix must have shape {(n_features, n_features)}. Got {out_matrix.shape}"
+            )
+
+        if return_parts or (pvalue_n_perms is not None and pvalue_n_perms > 0):
+            raise ValueError("out_matrix cannot be used with return_parts or pvalue_n_perms")
+
     # get number of cores to use
     n_workers = get_n_workers(n_jobs)
 
@@ -687,112 +1637,113 @@ def ccc(
     if range_n_clusters.shape[0] == 0:
         raise ValueError(f"Data has too few objects: {n_objects}")
 
-    # store a set of partitions per row (object) in X as a multidimensional
-    # array, where the second dimension is the number of partitions per object.
-    parts = (
-        np.zeros((n_features, range_n_clusters.shape[0], n_objects), dtype=np.int16) - 1
-    )
-
     # cm_values stores the CCC coefficients
     n_features_comp = (n_features * (n_features - 1)) // 2
-    cm_values = np.full(n_features_comp, np.nan)
     cm_pvalues = np.full(n_features_comp, np.nan)
 
-    # for each object pair being compared, max_parts has the indexes of the
-    # partitions that maximimized the ARI
-    max_parts = np.zeros((n_features_comp, 2), dtype=np.uint64)
-
-    with (
-        ThreadPoolExecutor(max_workers=n_workers) as executor,
-        ProcessPoolExecutor(max_workers=n_workers) as pexecutor,
-    ):
-        map_func = map
-        if n_workers > 1:
-            if partitioning_executor == "thread":
-                map_func = executor.map
-            elif partitioning_executor == "process":
-                map_func = pexecutor.map
-
-        # pre-compute the internal partitions for each object in parallel
-
-        # first, create a list with features-k pairs that will be used to parallelize
-        # the partitioning step
-        inputs = get_chunks(
-            [
-                (f_idx, c_idx, c)
-                for f_idx in range(n_features)
-                for c_idx, c in enumerate(range_n_clusters)
-            ],
-            n_workers,
-            n_chunks_threads_ratio,
+    # all parallel code below runs in numba's thread pool, which is limited
+    # to the number of workers requested by the user. With a single worker,
+    # the sequential versions of the kernels are used instead, and the thread
+    # pool is not touched.
+    use_parallel_kernels = n_workers > 1
+    if use_parallel_kernels:
+        feature_parts_func = get_feature_parts
+        compute_coef_func = compute_coef
+
+        default_n_threads = get_num_threads()
+        set_num_threads(min(n_workers, config.NUMBA_NUM_THREADS))
+    else:
+        feature_parts_func = get_feature_parts_sequential
+        compute_coef_func = compute_coef_sequential
+
+    try:
+        # cluster labels are usually small (k is at most 10 by default), so
+        # partitions are stored as int8 if all labels fit, which halves the
+        # memory read by the contingency loop in compute_coef. Categorical
+        # features or a large internal_n_clusters might need int16, which is
+        # also kept if the partitions are returned to the user.
+        max_label = range_n_clusters.max() - 1
+        if not X_numerical_type.all():
+            max_label = max(max_label, X[~X_numerical_type].max())
+
+        parts_dtype = np.int16
+        if not return_parts and max_label < np.iinfo(np.int8).max:
+            parts_dtype = np.int8
+
+        # pre-compute the internal partitions for each object in parallel.
+        # parts stores a set of partitions per row (object) in X as a
+        # multidimensional array, where the second dimension is the number of
+        # partitions per object.
+        parts, features_valid = feature_parts_func(
+            X, X_numerical_type, range_n_clusters, parts_dtype
         )
-
-        # then, flatten the list of features-k pairs into a list that is divided into
-        # chunks that will be used to parallelize the partitioning step.
-        inputs = [
-            [
+        # compute_coef relies on parts[i] being contiguous blocks
+        assert parts.flags["C_CONTIGUOUS"]
+
+        # identify repeated partitions across features, so the ARI between
+        # them is computed only once. The cache of ARI values is only used if
+        # there are many repeated partitions and it fits in memory.
+        parts_ids = get_parts_ids(parts)
+        n_parts_ids = parts_ids.max() + 1
+        if (
+            n_parts_ids < MAX_UNIQUE_PARTS_FRACTION * parts_ids.size
+            and n_parts_ids**2 <= MAX_ARI_CACHE_SIZE
+        ):
+            ari_cache = np.full((n_parts_ids, n_parts_ids), np.nan)
+        else:
+            ari_cache = np.empty((0, 0))
+
+        # compute the coefficient for all object pairs in parallel. For each
+        # object pair being compared, max_parts has the indexes of the
+        # partitions that maximimized the ARI
+        cm_values, max_parts = compute_coef_func(
+            parts,
+            features_valid,
+            parts_ids,
+            ari_cache,
+            out_matrix if out_matrix is not None else np.empty((0, 0)),
+        )
+    finally:
+        if use_parallel_kernels:
+            set_num_threads(default_n_threads)
+
+    if out_matrix is not None:
+        return out_matrix
+
+    if pvalue_n_perms is not None and pvalue_n_perms > 0:
+        with ProcessPoolExecutor(max_workers=n_workers) as pexecutor:
+            # permutations are run in parallel across object pairs, unless
+            # there is only one pair. In that case, the permutations of that
+            # pair are parallelized.
+            map_func = map
+            inner_executor = DummyExecutor()
+
+            if n_workers > 1:
+                if n_features_comp == 1:
+                    inner_executor = pexecutor
+                else:
+                    map_func = pexecutor.map
+
+            # iterate over all chunks of object pairs and compute the p-values
+            inputs = get_chunks(n_features_comp, n_workers, n_chunks_threads_ratio)
+            inputs = [
                 (
-                    feature_k_pair,
-                    X[feature_k_pair[0]],
-                    X_numerical_type[feature_k_pair[0]],
+                    i,
+                    n_features,
+                    parts,
+                    cm_values[i],
+                    pvalue_n_perms,
+                    n_workers,
+                    n_chunks_threads_ratio,
+                    inner_executor,
                 )
-                for feature_k_pair in chunk
+                for i in inputs
             ]
-            for chunk in inputs
-        ]
 
-        for params, ps in zip(inputs, map_func(get_feature_parts, inputs)):
-            # get the set of feature indexes and cluster indexes
-            f_idxs = [p[0][0] for p in params]
-            c_idxs = [p[0][1] for p in params]
-
-            # update the partitions for each feature-k pair
-            parts[f_idxs, c_idxs] = ps
-
-        # Below, there are two layers of parallelism: 1) parallel execution
-        # across feature pairs and 2) the cdist_parts_parallel function, which
-        # also runs several threads to compare partitions using ari. In 2) we
-        # need to disable parallelization in case len(cm_values) > 1 (that is,
-        # we have several feature pairs to compare), because parallelization is
-        # already performed at this level. Otherwise, more threads than
-        # specified by the user are started.
-        map_func = map
-        cdist_executor = False
-        inner_executor = DummyExecutor()
-
-        if n_workers > 1:
-            if n_features_comp == 1:
-                map_func = map
-                cdist_executor = executor
-                inner_executor = pexecutor
-
-            else:
-                map_func = pexecutor.map
-
-        # iterate over all chunks of object pairs and compute the coefficient
-        inputs = get_chunks(n_features_comp, n_workers, n_chunks_threads_ratio)
-        inputs = [
-            (
-                i,
-                n_features,
-                parts,
-                pvalue_n_perms,
-                n_workers,
-                n_chunks_threads_ratio,
-                cdist_executor,
-                inner_executor,
-            )
-            for i in inputs
-        ]
-
-        for params, (max_ari_list, max_part_idx_list, pvalues) in zip(
-            inputs, map_func(compute_coef, inputs)
-        ):
-            f_idx = params[0]
+            for params, pvalues in zip(inputs, map_func(compute_pvalues, inputs)):
+                f_idx = params[0]
 
-            cm_values[f_idx] = max_ari_list
-            max_parts[f_idx, :] = max_part_idx_list
-            cm_pvalues[f_idx] = pvalues
+                cm_pvalues[f_idx] = pvalues
 
     # return an array of values or a single scalar, depending on the input data
     if cm_values.shape[0] == 1:
@@ -18,18 +18,33 @@ import numpy as np
 from sklearn.metrics import pairwise_distances
 
 
+def _pearson_matrix(data: np.ndarray) -> np.ndarray:
+    """
+    Computes the Pearson correlation coefficient between all pairs of rows in
+    data. Rows are centered and scaled to unit norm, so all correlations are
+    computed with a single matrix product (which uses BLAS).
+    """
+    data = data - data.mean(axis=1, keepdims=True)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+
+    corr_mat = data @ data.T
+
+    # rounding errors could give values slightly outside [-1, 1]
+    return np.clip(corr_mat, -1.0, 1.0, out=corr_mat)
+
+
 def pearson(data: pd.DataFrame) -> pd.DataFrame:
     """
     Compute the Pearson correlation coefficient.
     """
-    corr_mat = 1 - pairwise_distances(data.to_numpy(), metric="correlation", n_jobs=1)
+    corr_mat = _pearson_matrix(data.to_numpy(dtype=float))
 
     np.fill_diagonal(corr_mat, 1.0)
 
     return pd.DataFrame(
         corr_mat,
-        index=data.index.copy(),
-        columns=data.index.copy(),
+        index=data.index,
+        columns=data.index,
     )
 
 
@@ -40,14 +55,14 @@ def spearman(data: pd.DataFrame) -> pd.DataFrame:
     # compute ranks
     data = data.rank(axis=1)
 
-    corr_mat = 1 - pairwise_distances(data.to_numpy(), metric="correlation", n_jobs=1)
+    corr_mat = _pearson_matrix(data.to_numpy(dtype=float))
 
     np.fill_diagonal(corr_mat, 1.0)
 
     return pd.DataFrame(
         corr_mat,
-        index=data.index.copy(),
-        columns=data.index.copy(),
+        index=data.index,
+        columns=data.index,
     )
 
 
@@ -73,8 +88,8 @@ def mic(data: pd.DataFrame, estimator="mic_approx", n_jobs=None) -> pd.DataFrame
 
     return pd.DataFrame(
         corr_mat,
-        index=data.index.copy(),
-        columns=data.index.copy(),
+        index=data.index,
+        columns=data.index,
     )
 
 
@@ -82,20 +97,23 @@ def ccc(data: pd.DataFrame, internal_n_clusters=None, n_jobs=1) -> pd.DataFrame:
     """
     Compute the Clustermatch Correlation Coefficient (CCC).
     """
-    from scipy.spatial.distance import squareform
-    from ccc.coef import ccc
+    from ccc.coef import ccc_ndarray
 
-    corr_mat = ccc(
+    # data is already a numerical array with features in rows, so input checks
+    # in ccc.coef.ccc are skipped. Coefficients are written directly into the
+    # square matrix.
+    corr_mat = np.empty((data.shape[0], data.shape[0]))
+    ccc_ndarray(
         data.to_numpy(),
         internal_n_clusters=internal_n_clusters,
         n_jobs=n_jobs,
+        out_matrix=corr_mat,
     )
 
-    corr_mat = squareform(corr_mat)
     np.fill_diagonal(corr_mat, 1.0)
 
     return pd.DataFrame(
         corr_mat,
-        index=data.index.copy(),
-        columns=data.index.copy(),
+        index=data.index,
+        columns=data.index,
     )
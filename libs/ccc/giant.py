@@ -2,38 +2,64 @@
 Contains functions to interact with the REST API of HumanBase (GIANT networks):
 https://hb.flatironinstitute.org/
 """
-from pathlib import Path
-import tempfile
-import json
-
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 
 URL_GENE_INFO = "https://hb.flatironinstitute.org/api/genes/"
 URL_TISSUE_PREDICTION = "https://hb.flatironinstitute.org/api/integrations/relevant/"
 
+# all requests share the same session, so connections to HumanBase are reused
+# (HTTP keep-alive) instead of opening a new one for each request. The
+# connection pool allows the session to be used from several threads, and
+# requests that fail to connect are retried.
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+# results of gene_exists and predict_tissue, since the same gene is usually part
+# of many gene pairs. Only answers obtained from successful responses are
+# stored, so a transient server error does not affect later calls.
+GENE_EXISTS_CACHE = {}
+TISSUE_PREDICTION_CACHE = {}
+
 
 def gene_exists(gene_entrez_id: str) -> bool:
     """
     Given a gene Entrez ID, it checks whether it exists in GIANT models.
+    Results from successful responses are cached (see GENE_EXISTS_CACHE).
 
     Returns:
         True if gene exists, False otherwise.
     """
-    url = URL_GENE_INFO + str(gene_entrez_id)
-    r = requests.get(url)
+    gene_entrez_id = str(gene_entrez_id)
+    if gene_entrez_id in GENE_EXISTS_CACHE:
+        return GENE_EXISTS_CACHE[gene_entrez_id]
+
+    url = URL_GENE_INFO + gene_entrez_id
+    r = SESSION.get(url)
 
     if r.status_code != 200:
         return False
 
     data = r.json()
-    return "entrez" in data and "standard_name" in data
+    exists = "entrez" in data and "standard_name" in data
+    GENE_EXISTS_CACHE[gene_entrez_id] = exists
+
+    return exists
 
 
 def predict_tissue(gene_pair: tuple[str, str]) -> tuple[str, str]:
     """
     Given a gene pair (Entrez IDs) as a tuple, it predicts a tissue or cell type
-    where they are specifically expressed.
+    where they are specifically expressed. Predictions are cached (see
+    TISSUE_PREDICTION_CACHE).
 
     Args:
         gene_pair: a tuple with a gene pair (two elements as string) with
@@ -43,12 +69,16 @@ def predict_tissue(gene_pair: tuple[str, str]) -> tuple[str, str]:
         A tuple with two elements: the tissue name and the URL to predict a
         network on this tissue.
     """
+    gene_pair = tuple(gene_pair)
+    if gene_pair in TISSUE_PREDICTION_CACHE:
+        return TISSUE_PREDICTION_CACHE[gene_pair]
+
     for gene in gene_pair:
         if not gene_exists(gene):
             return None
 
     params = {"entrez": list(gene_pair)}
-    r = requests.post(URL_TISSUE_PREDICTION, json=params)
+    r = SESSION.post(URL_TISSUE_PREDICTION, json=params)
     data = r.json()
 
     # check if top tissue is brenda
@@ -57,7 +87,10 @@ def predict_tissue(gene_pair: tuple[str, str]) -> tuple[str, str]:
     while data[top_id]["context"]["term"]["database"]["name"] != "BRENDA Ontology":
         top_id += 1
 
-    return data[top_id]["slug"], data[top_id]["url"]
+    tissue_prediction = data[top_id]["slug"], data[top_id]["url"]
+    TISSUE_PREDICTION_CACHE[gene_pair] = tissue_prediction
+
+    return tissue_prediction
 
 
 def rank_genes(
@@ -80,29 +113,29 @@ def rank_genes(
         Genes with a lower rank are more important for the network because they
         are more connected to the gene pair (query_gene_symbols).
     """
-    genes_query_degrees = {}
-    genes_degrees = {}
-
-    for g in all_genes:
-        # connections to query genes
-        g_query_genes = edges[
-            ((edges["gene1"] == g) & (edges["gene2"].isin(query_gene_symbols)))
-            | ((edges["gene2"] == g) & (edges["gene1"].isin(query_gene_symbols)))
-        ]
-
-        g_query_degree = g_query_genes["weight"].sum() / g_query_genes.shape[0]
-
-        # connections to all genes
-        g_all_genes = edges[(edges["gene1"] == g) | (edges["gene2"] == g)]
-
-        g_degree = g_all_genes["weight"].sum() / g_all_genes.shape[0]
+    # consider each edge in both directions, so every gene connected by an edge
+    # appears in column "gene" with the other gene in column "neighbor"
+    edges_both_dirs = pd.concat(
+        [
+            edges[["gene1", "gene2", "weight"]].set_axis(
+                ["gene", "neighbor", "weight"], axis=1
+            ),
+            edges[["gene2", "gene1", "weight"]].set_axis(
+                ["gene", "neighbor", "weight"], axis=1
+            ),
+        ],
+        ignore_index=True,
+    )
 
-        # save
-        genes_query_degrees[g] = g_query_degree
-        genes_degrees[g] = g_degree
+    # average weight of the connections of each gene to query genes
+    query_edges = edges_both_dirs[
+        edges_both_dirs["neighbor"].isin(query_gene_symbols)
+    ].groupby("gene")["weight"]
+    query_degrees = (query_edges.sum() / query_edges.size()).reindex(list(all_genes))
+    genes_query_degrees = dict(zip(query_degrees.index, query_degrees.to_numpy()))
 
-    # no degree correction (actually, genes_degrees is not used here, following
-    # the default behavior of GIANT)
+    # no degree correction (the connections of each gene to all genes are not
+    # used, following the default behavior of GIANT)
     gene_ranks = [
         (gene, idx)
         for idx, (gene, weight) in enumerate(
@@ -198,7 +231,7 @@ def get_network(
     if tissue is not None and len(tissue) == 2:
         tissue_prediction = list(tissue)
     elif tissue is None:
-        tissue_prediction = predict_tissue(gene_entrezids)
+        tissue_prediction = predict_tissue(tuple(gene_entrezids))
         if tissue_prediction is None:
             return None
     else:
@@ -207,28 +240,26 @@ def get_network(
     # predict a tissue-specific network
     url = tissue_prediction[1] + "network/"
     params = [("entrez", gene_entrezids[0]), ("entrez", gene_entrezids[1])]
-    r = requests.get(url, params)
+    r = SESSION.get(url, params=params)
     data = r.json()
 
     # mincut will be used to filter out genes and keep only those with a weight
     # larger than mincut
     mincut = data["mincut"]
 
-    # save the network to json files
-    temp_dir = Path(tempfile.mkdtemp(prefix="giant-"))
-    genes_json_file = temp_dir / "genes.json"
-    edges_json_file = temp_dir / "edges.json"
-    with open(genes_json_file, "w") as gf, open(edges_json_file, "w") as ef:
-        json.dump(data["genes"], gf)
-        json.dump(data["edges"], ef)
-
     # load network as panda objects
-    genes = pd.read_json(genes_json_file)["standard_name"]
-    edges = pd.read_json(edges_json_file)[["source", "target", "weight"]]
-
-    df = edges.join(genes.rename("gene1"), on="source", how="left").join(
-        genes.rename("gene2"), on="target", how="left"
-    )[["gene1", "gene2", "weight"]]
+    genes = pd.DataFrame.from_records(data["genes"])["standard_name"]
+    edges = pd.DataFrame.from_records(data["edges"])[["source", "target", "weight"]]
+
+    # edges refer to genes by their position in the list of genes
+    gene_names = genes.to_numpy()
+    df = pd.DataFrame(
+        {
+            "gene1": gene_names[edges["source"].to_numpy()],
+            "gene2": gene_names[edges["target"].to_numpy()],
+            "weight": edges["weight"].to_numpy(),
+        }
+    )
 
     # rank genes
     all_genes = set(df["gene1"]).union(set(df["gene2"]))
@@ -104,6 +104,7 @@ def get_pair_confusion_matrix(part0: np.ndarray, part1: np.ndarray) -> np.ndarra
     return C
 
 
+@njit(cache=True, nogil=True)
 def adjusted_rand_index(part0: np.ndarray, part1: np.ndarray) -> float:
     """
     Computes the adjusted Rand index (ARI) between two clustering partitions.
@@ -111,9 +112,10 @@ def adjusted_rand_index(part0: np.ndarray, part1: np.ndarray) -> float:
     https://scikit-learn.org/stable/modules/generated/sklearn.metrics.adjusted_rand_score.html
     See copyright notice at the top of this file.
 
-    This function should not be compiled with numba, since it depends on
-    arbitrarily large interger variable (supported by Python) to correctly
-    compute the ARI in large partitions.
+    The products in the final expression can be larger than the maximum 64-bit
+    integer in large partitions, so they are computed with floating point
+    numbers (instead of Python's arbitrarily large integers). This allows the
+    function to be compiled with numba.
 
     Args:
         part0: a 1d array with cluster assignments for n objects.
@@ -125,8 +127,29 @@ def adjusted_rand_index(part0: np.ndarray, part1: np.ndarray) -> float:
         match; it could be negative in some cases) and 1.0 (perfect match).
     """
     (tn, fp), (fn, tp) = get_pair_confusion_matrix(part0, part1)
-    # convert to Python integer types, to avoid overflow or underflow
-    tn, fp, fn, tp = int(tn), int(fp), int(fn), int(tp)
+    return get_adjusted_rand_index_from_pair_counts(tn, fp, fn, tp)
+
+
+@njit(cache=True, nogil=True)
+def get_adjusted_rand_index_from_pair_counts(tn, fp, fn, tp) -> float:
+    """
+    Computes the adjusted Rand index (ARI) given the elements of the pair
+    confusion matrix of two clustering partitions (see
+    get_pair_confusion_matrix). The code is based on the sklearn
+    implementation (see adjusted_rand_index).
+
+    Args:
+        tn: number of true negative pairs (position 00 of the pair confusion
+            matrix).
+        fp: number of false positive pairs (position 01).
+        fn: number of false negative pairs (position 10).
+        tp: number of true positive pairs (position 11).
+
+    Returns:
+        The adjusted Rand index between the two clustering partitions.
+    """
+    # convert to float, to avoid overflow or underflow
+    tn, fp, fn, tp = float(tn), float(fp), float(fn), float(tp)
 
     # Special cases: empty data or full agreement
     if fn == 0 and fp == 0:
@@ -121,12 +121,23 @@ gene_expr_df.shape
 # %% tags=[]
 gene_expr_df.head()
 
+# %% tags=[]
+# samples in rows and genes in columns, as needed by the plotting functions below;
+# it is transposed only once here
+gene_expr_samples_df = gene_expr_df.T
+
 # %% [markdown] tags=[]
 # ## Gene pairs intersection
 
 # %% tags=[]
 df_plot = pd.read_pickle(INPUT_GENE_PAIRS_INTERSECTIONS_FILE)
 
+# %% tags=[]
+# make sure intersection columns use the bool dtype (one byte per value), which
+# keeps them compact and lets them be packed as bits later (see get_gene_pairs)
+_bool_cols = [c for c in df_plot.columns if " (high)" in c or " (low)" in c]
+df_plot = df_plot.astype({c: bool for c in _bool_cols})
+
 # %% tags=[]
 df_plot.shape
 
@@ -211,20 +222,9 @@ with pd.option_context("display.max_rows", None):
 
 # %% tags=[]
 # add columns with ranks
-df_r_data = pd.concat(
-    [
-        df_plot,
-        df_plot[["ccc", "pearson", "spearman"]]
-        .rank()
-        .rename(
-            columns={
-                "ccc": "clustermatch_rank",
-                "pearson": "pearson_rank",
-                "spearman": "spearman_rank",
-            }
-        ),
-    ],
-    axis=1,
+df_r_data = df_plot.copy()
+df_r_data[["clustermatch_rank", "pearson_rank", "spearman_rank"]] = (
+    df_plot[["ccc", "pearson", "spearman"]].rank().to_numpy()
 )
 
 # %% tags=[]
@@ -256,6 +256,24 @@ df_r_data_boolean_cols = set(
 # %% tags=[]
 df_r_data_boolean_cols
 
+# %% tags=[]
+# the boolean columns of each gene pair are packed as bits into a single byte,
+# so gene pairs can be queried by comparing one byte per row (see
+# get_gene_pairs)
+assert len(df_r_data_boolean_cols) <= 8
+
+df_r_data_boolean_cols_idx = {
+    c: i for i, c in enumerate(sorted(df_r_data_boolean_cols))
+}
+df_r_data_boolean_packed = np.packbits(
+    df_r_data[sorted(df_r_data_boolean_cols)].to_numpy(dtype=bool),
+    axis=1,
+    bitorder="little",
+)[:, 0]
+
+# %% tags=[]
+df_r_data_boolean_packed.shape
+
 
 # %% [markdown] tags=[]
 # ## Functions
@@ -342,10 +360,6 @@ def plot_gene_pair(top_pairs_df, idx, bins="log", plot_gene_ids=True):
         The JointGrid object returned by seaborn.jointplot.
     """
     gene0, gene1 = top_pairs_df.iloc[idx].name
-    display((gene0, gene1))
-
-    gene0_symbol, gene1_symbol = gene_map[gene0], gene_map[gene1]
-    display((gene0_symbol, gene1_symbol))
 
     if "ccc_fdr" in top_pairs_df.columns:
         (
@@ -365,7 +379,7 @@ def plot_gene_pair(top_pairs_df, idx, bins="log", plot_gene_ids=True):
         ].tolist()
 
     p = sns.jointplot(
-        data=gene_expr_df.T,
+        data=gene_expr_samples_df,
         x=gene0,
         y=gene1,
         kind="hex",
@@ -396,7 +410,9 @@ def plot_gene_pair(top_pairs_df, idx, bins="log", plot_gene_ids=True):
     ]
     _title += f"\nunderstudied_score={understudied_score:.2f}  min_n_pubs={min_n_pubs}"
 
-    p.fig.suptitle(_title)
+    # the row index is part of the title (instead of being displayed
+    # separately), so gene pairs can be selected from the previews
+    p.fig.suptitle(f"Index: {idx}\n{_title}")
 
     return p
 
@@ -409,7 +425,9 @@ def get_gene_pairs(first_coef, query_set):
     the dataframe according to the query set provided.
 
     The function needs to access a variable named "df_r_data" that has the
-    intersections between coefficients.
+    intersections between coefficients, and variables
+    "df_r_data_boolean_packed" and "df_r_data_boolean_cols_idx" with its
+    boolean columns packed as bits.
 
     Args:
         first_coef: the main coefficient ("ccc", "pearson" or "spearman")
@@ -425,28 +443,11 @@ def get_gene_pairs(first_coef, query_set):
     """
     assert all([x in df_r_data_boolean_cols for x in query_set])
 
-    query = np.concatenate(
-        [
-            # columns that have to be true
-            np.concatenate(
-                [df_r_data[c].to_numpy().reshape(-1, 1) for c in query_set], axis=1
-            )
-            .all(axis=1)
-            .reshape(-1, 1),
-            # rest of the columns, that have to be false
-            np.concatenate(
-                [
-                    ~df_r_data[c].to_numpy().reshape(-1, 1)
-                    for c in df_r_data_boolean_cols
-                    if c not in query_set
-                ],
-                axis=1,
-            )
-            .all(axis=1)
-            .reshape(-1, 1),
-        ],
-        axis=1,
-    ).all(axis=1)
+    # columns in query_set have to be true, and the rest have to be false
+    query_row = np.zeros(len(df_r_data_boolean_cols_idx), dtype=bool)
+    query_row[[df_r_data_boolean_cols_idx[c] for c in query_set]] = True
+    query_code = np.packbits(query_row, bitorder="little")[0]
+    query = df_r_data_boolean_packed == query_code
 
     _tmp_df = df_r_data[query]
 
@@ -579,7 +580,6 @@ display(_tmp_df)
 
 # %% tags=[]
 for i in range(min(_tmp_df.shape[0], 5)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df, i)
     display(p.fig)
     plt.close(p.fig)
@@ -594,7 +594,6 @@ display(_tmp_df_pval)
 
 # %% tags=[]
 for i in range(min(_tmp_df_pval.shape[0], 5)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df_pval, i)
     display(p.fig)
     plt.close(p.fig)
@@ -611,7 +610,6 @@ display(_tmp_df_other_pval)
 
 # %% tags=[]
 for i in range(min(_tmp_df_other_pval.shape[0], 5)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df_other_pval, i)
     display(p.fig)
     plt.close(p.fig)
@@ -632,7 +630,7 @@ gene0_id = "ENSG00000135094.10"
 gene1_id = "ENSG00000111537.4"
 
 plot_and_save_gene_pair(
-    gene_expr_df.T,
+    gene_expr_samples_df,
     gene0_id,
     gene1_id,
     output_file_subset=gene_pair_subset,
@@ -648,7 +646,7 @@ gene0_id = "ENSG00000130208.9"
 gene1_id = "ENSG00000177606.6"
 
 plot_and_save_gene_pair(
-    gene_expr_df.T,
+    gene_expr_samples_df,
     gene0_id,
     gene1_id,
     output_file_subset=gene_pair_subset,
@@ -669,7 +667,7 @@ gene0_id = "ENSG00000130208.9"
 gene1_id = "ENSG00000128342.4"
 
 plot_and_save_gene_pair(
-    gene_expr_df.T,
+    gene_expr_samples_df,
     gene0_id,
     gene1_id,
     output_file_subset=gene_pair_subset,
@@ -705,7 +703,6 @@ display(_tmp_df)
 
 # %% tags=[]
 for i in range(min(_tmp_df.shape[0], 5)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df, i)
     display(p.fig)
     plt.close(p.fig)
@@ -722,7 +719,6 @@ display(_tmp_df_pval)
 
 # %% tags=[]
 for i in range(min(_tmp_df_pval.shape[0], 10)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df_pval, i)
     display(p.fig)
     plt.close(p.fig)
@@ -739,7 +735,6 @@ display(_tmp_df_other_pval)
 
 # %% tags=[]
 for i in range(min(_tmp_df_other_pval.shape[0], 5)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df_other_pval, i)
     display(p.fig)
     plt.close(p.fig)
@@ -760,7 +755,7 @@ gene0_id = "ENSG00000275385.1"
 gene1_id = "ENSG00000160446.18"
 
 plot_and_save_gene_pair(
-    gene_expr_df.T,
+    gene_expr_samples_df,
     gene0_id,
     gene1_id,
     output_file_subset=gene_pair_subset,
@@ -781,7 +776,7 @@ gene0_id = "ENSG00000275385.1"
 gene1_id = "ENSG00000178226.10"
 
 plot_and_save_gene_pair(
-    gene_expr_df.T,
+    gene_expr_samples_df,
     gene0_id,
     gene1_id,
     output_file_subset=gene_pair_subset,
@@ -817,7 +812,6 @@ display(_tmp_df)
 
 # %% tags=[]
 for i in range(min(_tmp_df.shape[0], 30)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df, i)
     display(p.fig)
     plt.close(p.fig)
@@ -834,7 +828,6 @@ display(_tmp_df_pval)
 
 # %% tags=[]
 for i in range(min(_tmp_df_pval.shape[0], 10)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df_pval, i)
     display(p.fig)
     plt.close(p.fig)
@@ -851,7 +844,6 @@ display(_tmp_df_other_pval)
 
 # %% tags=[]
 for i in range(min(_tmp_df_other_pval.shape[0], 5)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df_other_pval, i)
     display(p.fig)
     plt.close(p.fig)
@@ -872,7 +864,7 @@ gene0_id = "ENSG00000147050.14"
 gene1_id = "ENSG00000183878.15"
 
 plot_and_save_gene_pair(
-    gene_expr_df.T,
+    gene_expr_samples_df,
     gene0_id,
     gene1_id,
     output_file_subset=gene_pair_subset,
@@ -888,7 +880,7 @@ gene0_id = "ENSG00000115165.9"
 gene1_id = "ENSG00000101265.15"
 
 plot_and_save_gene_pair(
-    gene_expr_df.T,
+    gene_expr_samples_df,
     gene0_id,
     gene1_id,
     output_file_subset=gene_pair_subset,
@@ -909,7 +901,7 @@ gene0_id = "ENSG00000147050.14"
 gene1_id = "ENSG00000067048.16"
 
 plot_and_save_gene_pair(
-    gene_expr_df.T,
+    gene_expr_samples_df,
     gene0_id,
     gene1_id,
     output_file_subset=gene_pair_subset,
@@ -946,7 +938,6 @@ display(_tmp_df)
 
 # %% tags=[]
 for i in range(min(_tmp_df.shape[0], 10)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df, i)
     display(p.fig)
     plt.close(p.fig)
@@ -963,7 +954,6 @@ display(_tmp_df_pval)
 
 # %% tags=[]
 for i in range(min(_tmp_df_pval.shape[0], 10)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df_pval, i)
     display(p.fig)
     plt.close(p.fig)
@@ -980,7 +970,6 @@ display(_tmp_df_other_pval)
 
 # %% tags=[]
 for i in range(min(_tmp_df_other_pval.shape[0], 5)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df_other_pval, i)
     display(p.fig)
     plt.close(p.fig)
@@ -1001,7 +990,7 @@ gene0_id = "ENSG00000162413.16"
 gene1_id = "ENSG00000235027.1"
 
 plot_and_save_gene_pair(
-    gene_expr_df.T,
+    gene_expr_samples_df,
     gene0_id,
     gene1_id,
     output_file_subset=gene_pair_subset,
@@ -1022,7 +1011,7 @@ display(get_percentiles(_tmp))
 # gene1_id = "yyy"
 
 # plot_and_save_gene_pair(
-#     gene_expr_df.T,
+#     gene_expr_samples_df,
 #     gene0_id,
 #     gene1_id,
 #     output_file_subset=gene_pair_subset,
@@ -1058,7 +1047,6 @@ display(_tmp_df)
 
 # %% tags=[]
 for i in range(min(_tmp_df.shape[0], 10)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df, i)
     display(p.fig)
     plt.close(p.fig)
@@ -1075,7 +1063,6 @@ display(_tmp_df_pval)
 
 # %% tags=[]
 for i in range(min(_tmp_df_pval.shape[0], 10)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df_pval, i)
     display(p.fig)
     plt.close(p.fig)
@@ -1092,7 +1079,6 @@ display(_tmp_df_other_pval)
 
 # %% tags=[]
 for i in range(min(_tmp_df_other_pval.shape[0], 5)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df_other_pval, i)
     display(p.fig)
     plt.close(p.fig)
@@ -1113,7 +1099,7 @@ gene0_id = "ENSG00000130598.15"
 gene1_id = "ENSG00000177791.11"
 
 plot_and_save_gene_pair(
-    gene_expr_df.T,
+    gene_expr_samples_df,
     gene0_id,
     gene1_id,
     output_file_subset=gene_pair_subset,
@@ -1134,7 +1120,7 @@ display(get_percentiles(_tmp))
 # gene1_id = "yyy"
 
 # plot_and_save_gene_pair(
-#     gene_expr_df.T,
+#     gene_expr_samples_df,
 #     gene0_id,
 #     gene1_id,
 #     output_file_subset=gene_pair_subset,
@@ -1168,7 +1154,6 @@ display(_tmp_df)
 
 # %% tags=[]
 for i in range(min(_tmp_df.shape[0], 5)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df, i)
     display(p.fig)
     plt.close(p.fig)
@@ -1202,7 +1187,6 @@ display(_tmp_df)
 
 # %% tags=[]
 for i in range(min(_tmp_df.shape[0], 10)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df, i)
     display(p.fig)
     plt.close(p.fig)
@@ -1219,7 +1203,6 @@ display(_tmp_df_pval)
 
 # %% tags=[]
 for i in range(min(_tmp_df_pval.shape[0], 10)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df_pval, i)
     display(p.fig)
     plt.close(p.fig)
@@ -1236,7 +1219,6 @@ display(_tmp_df_other_pval)
 
 # %% tags=[]
 for i in range(min(_tmp_df_other_pval.shape[0], 5)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df_other_pval, i)
     display(p.fig)
     plt.close(p.fig)
@@ -1257,7 +1239,7 @@ gene0_id = "ENSG00000198467.13"
 gene1_id = "ENSG00000068976.13"
 
 plot_and_save_gene_pair(
-    gene_expr_df.T,
+    gene_expr_samples_df,
     gene0_id,
     gene1_id,
     output_file_subset=gene_pair_subset,
@@ -1278,7 +1260,7 @@ gene0_id = "ENSG00000167644.11"
 gene1_id = "ENSG00000161055.3"
 
 plot_and_save_gene_pair(
-    gene_expr_df.T,
+    gene_expr_samples_df,
     gene0_id,
     gene1_id,
     output_file_subset=gene_pair_subset,
@@ -1312,7 +1294,6 @@ display(_tmp_df)
 
 # %% tags=[]
 for i in range(min(_tmp_df.shape[0], 5)):
-    display(f"Index: {i}")
     p = plot_gene_pair(_tmp_df, i)
     display(p.fig)
     plt.close(p.fig)
@@ -91,20 +91,39 @@ assert gene_map["ENSG00000145309.5"] == "CABS1"
 assert gene_map[gene0_id] == gene0_symbol
 assert gene_map[gene1_id] == gene1_symbol
 
+# %% [markdown] tags=[]
+# ## Gene pair expression on all tissues
+
+# %% [markdown] tags=[]
+# Each tissue file is read only once, and the two genes are selected before transposing the data, so the entire gene expression matrix is never transposed.
+
+# %% tags=[]
+gene_pair_data = {}
+for f in TISSUE_DIR.glob("*.pkl"):
+    data = pd.read_pickle(f).loc[[gene0_id, gene1_id]].T.dropna()
+    if data.shape[0] <= 10:
+        continue
+
+    gene_pair_data[f.stem.split("_data_")[1]] = (
+        data[gene0_id].to_numpy(),
+        data[gene1_id].to_numpy(),
+    )
+
+# %% tags=[]
+len(gene_pair_data)
+
 # %% [markdown] tags=[]
 # # Compute correlation on all tissues
 
 # %% tags=[]
 res_all = pd.DataFrame(
     {
-        f.stem.split("_data_")[1]: {
-            "cm": ccc(data[gene0_id], data[gene1_id]),
-            "pearson": pearsonr(data[gene0_id], data[gene1_id])[0],
-            "spearman": spearmanr(data[gene0_id], data[gene1_id])[0],
+        tissue_name: {
+            "cm": ccc(gene0_data, gene1_data),
+            "pearson": pearsonr(gene0_data, gene1_data)[0],
+            "spearman": spearmanr(gene0_data, gene1_data)[0],
         }
-        for f in TISSUE_DIR.glob("*.pkl")
-        if (data := pd.read_pickle(f).T[[gene0_id, gene1_id]].dropna()) is not None
-        and data.shape[0] > 10
+        for tissue_name, (gene0_data, gene1_data) in gene_pair_data.items()
     }
 ).T
 
@@ -129,19 +148,17 @@ res_all.sort_values("spearman")
 # %% tags=[]
 res_pval_all = pd.DataFrame(
     {
-        f.stem.split("_data_")[1]: {
+        tissue_name: {
             "cm": ccc(
-                data[gene0_id],
-                data[gene1_id],
+                gene0_data,
+                gene1_data,
                 pvalue_n_perms=CCC_PVALUE_N_PERMS,
                 n_jobs=conf.GENERAL["N_JOBS"],
             )[1],
-            "pearson": pearsonr(data[gene0_id], data[gene1_id])[1],
-            "spearman": spearmanr(data[gene0_id], data[gene1_id])[1],
+            "pearson": pearsonr(gene0_data, gene1_data)[1],
+            "spearman": spearmanr(gene0_data, gene1_data)[1],
         }
-        for f in TISSUE_DIR.glob("*.pkl")
-        if (data := pd.read_pickle(f).T[[gene0_id, gene1_id]].dropna()) is not None
-        and data.shape[0] > 10
+        for tissue_name, (gene0_data, gene1_data) in gene_pair_data.items()
     }
 ).T
 
@@ -23,6 +23,8 @@
 # # Modules
 
 # %% tags=[]
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
 from statsmodels.stats.multitest import multipletests
@@ -173,6 +175,39 @@ _tmp = get_tissue_file("whole_blood")
 assert _tmp.exists()
 
 
+# %% tags=[]
+@lru_cache(maxsize=None)
+def get_gene_pair_data(tissue_name, gene0, gene1):
+    """
+    It returns the expression of a gene pair in a tissue merged with the
+    sample metadata. Results are cached, so plotting the same tissue again
+    does not read the tissue file again.
+
+    Args:
+        tissue_name: a string with the tissue name (or a part of it).
+        gene0: the Ensembl ID of the first gene.
+        gene1: the Ensembl ID of the second gene.
+
+    Returns:
+        A tuple with the tissue file and a DataFrame with samples in rows and
+        the two genes plus the metadata in columns.
+    """
+    tissue_file = get_tissue_file(tissue_name)
+    # select the gene pair before transposing, so the entire gene expression
+    # matrix is not transposed
+    tissue_data = pd.read_pickle(tissue_file).loc[[gene0, gene1]].T
+    tissue_data = pd.merge(
+        tissue_data,
+        gtex_metadata,
+        how="inner",
+        left_index=True,
+        right_index=True,
+        validate="one_to_one",
+    )
+
+    return tissue_file, tissue_data
+
+
 # %% tags=[]
 def simplify_tissue_name(tissue_name):
     return f"{tissue_name[0].upper()}{tissue_name[1:].replace('_', ' ')}"
@@ -204,17 +239,8 @@ def plot_gene_pair(
     It plots (joint plot) a gene pair from the given tissue. It saves the plot
     for the manuscript.
     """
-    # merge gene expression with metadata
-    tissue_file = get_tissue_file(tissue_name)
-    tissue_data = pd.read_pickle(tissue_file).T[[gene0, gene1]]
-    tissue_data = pd.merge(
-        tissue_data,
-        gtex_metadata,
-        how="inner",
-        left_index=True,
-        right_index=True,
-        validate="one_to_one",
-    )
+    # gene expression merged with metadata
+    tissue_file, tissue_data = get_gene_pair_data(tissue_name, gene0, gene1)
 
     # get gene symbols
     gene0_symbol, gene1_symbol = gene_map[gene0], gene_map[gene1]
@@ -23,6 +23,8 @@
 # # Modules
 
 # %% tags=[]
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 from tqdm import tqdm
 
@@ -38,6 +40,10 @@ DATASET_CONFIG = conf.GTEX
 # %% tags=[]
 N_TOP_GENE_PAIRS = 100
 
+# %% tags=[]
+# number of threads used to request networks from GIANT concurrently
+N_THREADS = 16
+
 # %% [markdown] tags=[]
 # # Paths
 
@@ -90,19 +96,15 @@ def convert_gene_pairs(gene_pairs, convert_to_entrezid=False):
     """
     Converts gene pair information (as dataframe) into a suitable format for the function process_tissue_networks.
     """
-    gene_pairs = gene_pairs.reset_index()
+    gene0 = gene_pairs.index.get_level_values(0)
+    gene1 = gene_pairs.index.get_level_values(1)
 
     if convert_to_entrezid:
-        gene_pairs = gene_pairs.replace(
-            {
-                "level_0": gene_symbol_to_entrezid,
-                "level_1": gene_symbol_to_entrezid,
-            }
-        )
-
-    gene_pairs = gene_pairs[["level_0", "level_1"]].itertuples(index=False, name=None)
+        # genes without an Entrez ID are kept unchanged
+        gene0 = gene0.map(lambda g: gene_symbol_to_entrezid.get(g, g))
+        gene1 = gene1.map(lambda g: gene_symbol_to_entrezid.get(g, g))
 
-    return list(gene_pairs)
+    return list(zip(gene0.tolist(), gene1.tolist()))
 
 
 # %% tags=[]
@@ -112,66 +114,88 @@ def process_tissue_networks(gene_pairs, output_directory, force_tissue=None):
     relevant tissue for each gene pair and its gene network. Then it saves all the genes
     in the networks with their edges' values.
 
+    Networks are requested concurrently in batches of gene pairs (as many as networks
+    are still needed), and they are saved sequentially in the same order as gene_pairs.
+
     If force_tissue is None, then autodetect the cell type for gene pairs.
     Otherwise, force_tissue should be a string, which will be used as key to query in
     dictionary TISSUE_SPECIFIC_URLS.
     """
-    with tqdm(total=min(N_TOP_GENE_PAIRS, len(gene_pairs)), ncols=100) as pbar:
+    suffix = ""
+    tissue = None
+    if force_tissue is not None:
+        suffix = f"-{force_tissue}"
+        tissue = TISSUE_SPECIFIC_URLS[force_tissue]
+
+    with tqdm(
+        total=min(N_TOP_GENE_PAIRS, len(gene_pairs)), ncols=100
+    ) as pbar, ThreadPoolExecutor(max_workers=N_THREADS) as executor:
         gp_idx = 0
 
         while pbar.n < N_TOP_GENE_PAIRS and gp_idx < len(gene_pairs):
-            gp = gene_pairs[gp_idx]
+            batch_gp_idxs = range(
+                gp_idx, min(gp_idx + N_TOP_GENE_PAIRS - pbar.n, len(gene_pairs))
+            )
+            gp_idx = batch_gp_idxs[-1] + 1
+
+            # predict a network for each gene pair, unless the output file already
+            # exists
+            batch_tasks = []
+            for batch_gp_idx in batch_gp_idxs:
+                gp = gene_pairs[batch_gp_idx]
 
-            pbar.set_description(",".join(gp))
+                output_filepath = (
+                    output_directory
+                    / f"{batch_gp_idx:03d}-{gp[0].lower()}_{gp[1].lower()}{suffix}.h5"
+                )
 
-            # check whether file already exists
-            suffix = ""
-            if force_tissue is not None:
-                suffix = f"-{force_tissue}"
+                future = None
+                if not output_filepath.exists():
+                    future = executor.submit(
+                        get_network,
+                        gene_symbols=gp,
+                        gene_ids_mappings=gene_id_mappings,
+                        tissue=tissue,
+                    )
 
-            output_filepath = (
-                output_directory
-                / f"{gp_idx:03d}-{gp[0].lower()}_{gp[1].lower()}{suffix}.h5"
-            )
-            if output_filepath.exists():
-                output_filepath.touch()
+                batch_tasks.append((gp, output_filepath, future))
 
-                gp_idx += 1
-                pbar.update(1)
-                continue
+            # save networks (HDF5 files are written from this thread only)
+            for gp, output_filepath, future in batch_tasks:
+                pbar.set_description(",".join(gp))
 
-            output_directory.mkdir(exist_ok=True, parents=True)
+                if future is None:
+                    output_filepath.touch()
+                    pbar.update(1)
+                    continue
 
-            # predict a network for a gene pair
-            _res = get_network(
-                gene_symbols=gp,
-                gene_ids_mappings=gene_id_mappings,
-                tissue=TISSUE_SPECIFIC_URLS[force_tissue]
-                if force_tissue is not None
-                else None,
-            )
-            if _res is None:
-                gp_idx += 1
-                continue
+                _res = future.result()
+                if _res is None:
+                    continue
 
-            df, tissue, mincut = _res
+                df, tissue_name, mincut = _res
 
-            assert not df.isna().any().any()
+                assert not df.isna().any().any()
 
-            with pd.HDFStore(output_filepath, mode="w", complevel=4) as store:
-                store.put("data", df, format="table")
+                output_directory.mkdir(exist_ok=True, parents=True)
 
-                metadata = pd.DataFrame(
-                    {
-                        "tissue": tissue,
-                        "mincut": mincut,
-                    },
-                    index=[0],
-                )
-                store.put("metadata", metadata, format="table")
+                # networks are always read whole, so the fixed format (faster
+                # to write) is used instead of the table format
+                with pd.HDFStore(
+                    output_filepath, mode="w", complevel=5, complib="blosc:zstd"
+                ) as store:
+                    store.put("data", df, format="fixed")
+
+                    metadata = pd.DataFrame(
+                        {
+                            "tissue": tissue_name,
+                            "mincut": mincut,
+                        },
+                        index=[0],
+                    )
+                    store.put("metadata", metadata, format="fixed")
 
-            gp_idx += 1
-            pbar.update(1)
+                pbar.update(1)
 
 
 # %% [markdown] tags=[]
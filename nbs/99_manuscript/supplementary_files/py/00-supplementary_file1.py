@@ -160,11 +160,16 @@ df_full.head()
 # ## Add gene symbols
 
 # %% tags=[]
+# symbols are looked up once for each unique gene in the index levels, and then
+# expanded to all gene pairs using the level codes
 df_full = df_full.assign(
-    gene0_symbol=df_full.apply(lambda x: gene_map[x.name[0]], axis=1),
-    gene1_symbol=df_full.apply(lambda x: gene_map[x.name[1]], axis=1),
+    gene0_symbol=df_full.index.levels[0].map(gene_map).take(df_full.index.codes[0]),
+    gene1_symbol=df_full.index.levels[1].map(gene_map).take(df_full.index.codes[1]),
 )
 
+# %% tags=[]
+assert not df_full[["gene0_symbol", "gene1_symbol"]].isna().any().any()
+
 # %% tags=[]
 df_full.shape
 
@@ -17,7 +17,7 @@
 # # Description
 
 # %% [markdown] tags=[]
-# Similar as `06` but it computes across gene pairs instead of data matrix.
+# Similar as `06`, it profiles a single call to `ccc` on the data matrix, but with few genes and many samples (10 genes and 30000 samples, instead of 500 genes and 1000 samples).
 
 # %% [markdown] tags=[]
 # # Remove pycache dir
@@ -40,6 +40,7 @@
 # %% tags=[]
 import numpy as np
 
+from ccc import conf
 from ccc.coef import ccc
 
 # %% tags=[]
@@ -61,20 +62,20 @@ data = np.random.rand(n_genes, n_samples)
 # %% tags=[]
 data.shape
 
+# %% [markdown] tags=[]
+# Gene pairs are computed in parallel using this number of cores:
+
+# %% tags=[]
+conf.GENERAL["N_JOBS"]
+
 
 # %% [markdown] tags=[]
 # # With default `internal_n_clusters`
 
 # %% tags=[]
 def func():
-    res = np.full(int((data.shape[0] * (data.shape[0] - 1)) / 2), np.nan)
-
     n_clust = list(range(2, 10 + 1))
-    idx = 0
-    for i in range(data.shape[0] - 1):
-        for j in range(i + 1, data.shape[0]):
-            res[idx] = ccc(data[i], data[j], internal_n_clusters=n_clust)
-            idx += 1
+    return ccc(data, internal_n_clusters=n_clust, n_jobs=conf.GENERAL["N_JOBS"])
 
 
 # %% tags=[]
@@ -91,14 +92,8 @@ func()
 
 # %% tags=[]
 def func():
-    res = np.full(int((data.shape[0] * (data.shape[0] - 1)) / 2), np.nan)
-
     n_clust = list(range(2, 5 + 1))
-    idx = 0
-    for i in range(data.shape[0] - 1):
-        for j in range(i + 1, data.shape[0]):
-            res[idx] = ccc(data[i], data[j], internal_n_clusters=n_clust)
-            idx += 1
+    return ccc(data, internal_n_clusters=n_clust, n_jobs=conf.GENERAL["N_JOBS"])
 
 
 # %% tags=[]
@@ -1,4 +1,3 @@
-from concurrent.futures import ThreadPoolExecutor
 from random import shuffle
 from unittest.mock import patch
 import time
@@ -7,20 +6,41 @@ import os
 import numpy as np
 import pandas as pd
 import pytest
+from scipy.spatial.distance import squareform
 from sklearn.preprocessing import minmax_scale
 from sklearn.metrics import adjusted_rand_score as ari
 
 from ccc.coef import (
     ccc,
+    ccc_ndarray,
     get_range_n_clusters,
     run_quantile_clustering,
+    run_quantile_clustering_by_partition,
+    get_rank_counts,
+    get_quantile_threshold,
+    get_quantile_ranks,
+    assign_quantile_clusters,
     get_perc_from_k,
     get_parts,
+    get_feature_parts,
+    get_feature_parts_sequential,
+    get_parts_ids,
+    get_parts_stats,
+    compute_ari,
     get_coords_from_index,
+    COEF_TILE_SIZE,
     cdist_parts_basic,
-    cdist_parts_parallel,
+    cdist_parts_cached,
+    get_ari_cached,
+    get_ari_upper_bound,
+    get_features_parts_stats,
+    get_max_ari,
+    get_ccc_from_cdist,
+    compute_coef,
+    compute_coef_sequential,
     get_chunks,
     get_n_workers,
+    get_feature_type_and_encode,
 )
 
 
@@ -127,6 +147,107 @@ def test_run_quantile_clustering_with_four_clusters():
     assert ari(data_ref, part) == 1.0
 
 
+def test_get_quantile_ranks():
+    data = np.array([3.0, 1.0, 2.0, 2.0])
+
+    data_sorted, data_perc_sorted = get_quantile_ranks(data)
+
+    np.testing.assert_array_equal(data[data_sorted], np.array([1.0, 2.0, 2.0, 3.0]))
+    # ties have the same (average) rank
+    np.testing.assert_array_equal(
+        data_perc_sorted, np.array([1.0, 2.5, 2.5, 4.0]) / len(data)
+    )
+
+
+def test_assign_quantile_clusters_same_as_run_quantile_clustering():
+    # Prepare
+    np.random.seed(0)
+
+    # with and without ties
+    for data in (np.random.rand(100), np.random.randint(0, 5, 100)):
+        data_sorted, data_perc_sorted = get_quantile_ranks(data)
+
+        for k in range(2, 11):
+            # Run
+            part = assign_quantile_clusters(data_sorted, data_perc_sorted, k)
+
+            # Validate
+            np.testing.assert_array_equal(part, run_quantile_clustering(data, k))
+
+
+def test_assign_quantile_clusters_cut_points_same_as_searchsorted():
+    # Prepare
+    np.random.seed(0)
+
+    for n in (2, 3, 7, 10, 30, 99, 100, 101, 1000):
+        # with and without ties, and with a large group of ties (zeros)
+        for data in (
+            np.random.rand(n),
+            np.random.randint(0, 5, n),
+            np.random.rand(n) * (np.random.rand(n) > 0.6),
+        ):
+            data_sorted, data_perc_sorted = get_quantile_ranks(data)
+
+            for k in range(2, 21):
+                # cut points computed by searching all percentiles
+                percentiles = [0.0] + get_perc_from_k(k) + [1.0]
+                cut_points = np.searchsorted(
+                    data_perc_sorted, percentiles, side="right"
+                )
+                expected_part = np.zeros(n, dtype=np.int16) - 1
+                for i in range(len(cut_points) - 1):
+                    expected_part[data_sorted[cut_points[i] : cut_points[i + 1]]] = i
+
+                # Run
+                part = assign_quantile_clusters(data_sorted, data_perc_sorted, k)
+
+                # Validate
+                np.testing.assert_array_equal(part, expected_part)
+
+
+def test_get_rank_counts():
+    data = np.array([3.0, 1.0, 2.0, 2.0, 5.0])
+
+    assert get_rank_counts(data, 2.0) == (1, 2)
+    assert get_rank_counts(data, 1.0) == (0, 1)
+    assert get_rank_counts(data, 4.0) == (4, 0)
+
+
+def test_get_quantile_threshold():
+    # normalized ranks: 1.0: 0.2, 2.0: 0.5 (tie), 3.0: 0.8, 5.0: 1.0
+    data = np.array([3.0, 1.0, 2.0, 2.0, 5.0])
+
+    assert get_quantile_threshold(data, 0.1) == (False, 1.0)
+    assert get_quantile_threshold(data, 0.2) == (True, 1.0)
+    assert get_quantile_threshold(data, 0.4) == (True, 1.0)
+    assert get_quantile_threshold(data, 0.5) == (True, 2.0)
+    assert get_quantile_threshold(data, 0.6) == (True, 2.0)
+    assert get_quantile_threshold(data, 0.9) == (True, 3.0)
+    assert get_quantile_threshold(data, 1.0) == (True, 5.0)
+
+
+def test_run_quantile_clustering_by_partition_same_as_run_quantile_clustering():
+    # Prepare
+    np.random.seed(0)
+
+    for n in (1, 2, 3, 10, 33, 100, 101, 1000):
+        # with and without ties, with a large group of ties (zeros), and with
+        # all the same values
+        for data in (
+            np.random.rand(n),
+            np.random.randint(0, 3, n).astype(float),
+            np.random.randint(0, 20, n).astype(float),
+            np.random.rand(n) * (np.random.rand(n) > 0.6),
+            np.ones(n),
+        ):
+            for k in range(2, 21):
+                # Run
+                part = run_quantile_clustering_by_partition(data, k)
+
+                # Validate
+                np.testing.assert_array_equal(part, run_quantile_clustering(data, k))
+
+
 def test_get_range_n_clusters_without_internal_n_clusters():
     # 100 features
     range_n_clusters = get_range_n_clusters(100)
@@ -471,6 +592,212 @@ def test_cm_single_argument_is_matrix():
     assert cm_value[2] < 0.03
 
 
+def test_cm_single_argument_is_matrix_with_many_features():
+    # more features than the tile size used to process feature pairs, so
+    # several (and incomplete) tiles are used
+    np.random.seed(0)
+
+    input_data = np.random.rand(COEF_TILE_SIZE * 2 + 5, 50)
+    # add features with a relationship and a feature with all the same values
+    input_data[3] = input_data[40] ** 2
+    input_data[COEF_TILE_SIZE + 1] = input_data[COEF_TILE_SIZE * 2 + 4] * 2
+    input_data[10] = 1.0
+
+    # Run
+    cm_values, max_parts, _ = ccc(input_data, return_parts=True)
+
+    # Validate
+    n_features = input_data.shape[0]
+    assert cm_values.shape == ((n_features * (n_features - 1)) // 2,)
+
+    for idx in range(cm_values.shape[0]):
+        i, j = get_coords_from_index(n_features, idx)
+        expected_cm_value, expected_max_parts, _ = ccc(
+            input_data[i], input_data[j], return_parts=True
+        )
+
+        if np.isnan(expected_cm_value):
+            assert np.isnan(cm_values[idx])
+        else:
+            assert cm_values[idx] == expected_cm_value
+            np.testing.assert_array_equal(max_parts[idx], expected_max_parts)
+
+    # features with a relationship
+    assert np.sum(cm_values == 1.0) == 2
+
+
+def test_compute_coef_sequential_same_as_parallel():
+    np.random.seed(0)
+
+    # more features than the tile size, so several tiles are used
+    X = np.random.rand(COEF_TILE_SIZE * 2 + 5, 100)
+    X[3] = X[40] ** 2
+    X[10] = 1.0
+    X_numerical_type = np.full(X.shape[0], True)
+
+    parts, features_valid = get_feature_parts(
+        X, X_numerical_type, get_range_n_clusters(X.shape[1])
+    )
+    parts_ids = get_parts_ids(parts)
+    n_parts_ids = parts_ids.max() + 1
+
+    # with and without cache of ARI values
+    for ari_cache_shape in ((n_parts_ids, n_parts_ids), (0, 0)):
+        # run
+        cm_values, max_parts = compute_coef_sequential(
+            parts,
+            features_valid,
+            parts_ids,
+            np.full(ari_cache_shape, np.nan),
+            np.empty((0, 0)),
+        )
+
+        # validate
+        expected_cm_values, expected_max_parts = compute_coef(
+            parts,
+            features_valid,
+            parts_ids,
+            np.full(ari_cache_shape, np.nan),
+            np.empty((0, 0)),
+        )
+        np.testing.assert_array_equal(cm_values, expected_cm_values)
+        np.testing.assert_array_equal(max_parts, expected_max_parts)
+        assert np.isnan(cm_values).sum() == X.shape[0] - 1
+
+
+def test_ccc_ndarray_same_as_ccc():
+    np.random.seed(0)
+
+    input_data = np.random.rand(10, 100)
+    input_data[1] = input_data[0] ** 2
+
+    # Run
+    cm_values, max_parts, parts = ccc_ndarray(input_data, return_parts=True)
+
+    # Validate
+    expected_cm_values, expected_max_parts, expected_parts = ccc(
+        input_data, return_parts=True
+    )
+    np.testing.assert_array_equal(cm_values, expected_cm_values)
+    np.testing.assert_array_equal(max_parts, expected_max_parts)
+    np.testing.assert_array_equal(parts, expected_parts)
+    assert cm_values[0] == 1.0
+
+    # with two features, a scalar is returned
+    cm_value = ccc_ndarray(input_data[:2])
+    assert isinstance(cm_value, float)
+    assert cm_value == 1.0
+
+
+def test_ccc_ndarray_categorical_with_many_categories():
+    np.random.seed(0)
+
+    # categorical codes do not fit in int8, so partitions are stored as int16
+    input_data = np.random.rand(4, 500)
+    input_data[2] = np.random.randint(0, 300, input_data.shape[1])
+    input_data[3] = input_data[2] // 2
+    X_numerical_type = np.array([True, True, False, False])
+
+    # Run
+    cm_values = ccc_ndarray(input_data, X_numerical_type)
+
+    # Validate
+    expected_cm_values, _, parts = ccc_ndarray(
+        input_data, X_numerical_type, return_parts=True
+    )
+    assert parts.dtype == np.int16
+    np.testing.assert_array_equal(cm_values, expected_cm_values)
+    assert cm_values[-1] > 0.0
+
+
+def test_ccc_ndarray_many_repeated_partitions():
+    np.random.seed(0)
+
+    # features are repeated (with a monotonic transformation, which leads to
+    # the same partitions), so the cache of ARI values is used
+    base_data = np.random.rand(5, 100)
+    input_data = np.concatenate([base_data, np.exp(base_data), base_data**3])
+
+    # Run
+    cm_values = squareform(ccc_ndarray(input_data), checks=False)
+
+    # Validate
+    expected_cm_values = squareform(ccc_ndarray(base_data), checks=False)
+    n = base_data.shape[0]
+    for i in range(3):
+        for j in range(3):
+            block = cm_values[i * n : (i + 1) * n, j * n : (j + 1) * n]
+            np.testing.assert_array_equal(
+                block[~np.eye(n, dtype=bool)],
+                expected_cm_values[~np.eye(n, dtype=bool)],
+            )
+            if i != j:
+                assert np.all(np.diag(block) == 1.0)
+
+
+def test_ccc_ndarray_out_matrix():
+    np.random.seed(0)
+
+    # more features than the tile size, so several tiles are used
+    input_data = np.random.rand(COEF_TILE_SIZE * 2 + 5, 100)
+    input_data[1] = input_data[0] ** 2
+    input_data[10] = 1.0
+    n_features = input_data.shape[0]
+
+    # the constant feature gets NaN values
+    expected_cm_values = squareform(ccc_ndarray(input_data), checks=False)
+
+    for n_jobs in (1, 2):
+        # Run
+        out_matrix = np.full((n_features, n_features), -5.0)
+        cm_values = ccc_ndarray(input_data, n_jobs=n_jobs, out_matrix=out_matrix)
+
+        # Validate
+        assert cm_values is out_matrix
+        # the diagonal is not modified
+        assert np.all(np.diag(cm_values) == -5.0)
+        np.fill_diagonal(cm_values, 0.0)
+        np.fill_diagonal(expected_cm_values, 0.0)
+        np.testing.assert_array_equal(cm_values, expected_cm_values)
+        assert cm_values[0, 1] == cm_values[1, 0] == 1.0
+
+    # wrong shape
+    with pytest.raises(ValueError):
+        ccc_ndarray(input_data, out_matrix=np.empty((n_features, n_features - 1)))
+
+    # not supported with other options
+    with pytest.raises(ValueError):
+        ccc_ndarray(
+            input_data,
+            return_parts=True,
+            out_matrix=np.empty((n_features, n_features)),
+        )
+
+
+def test_ccc_ndarray_with_categorical_feature():
+    np.random.seed(0)
+
+    numerical_feature0 = np.random.rand(100)
+    categorical_feature1 = np.where(
+        numerical_feature0 < np.median(numerical_feature0), "l", "u"
+    )
+
+    # features are already encoded
+    X = np.array(
+        [
+            numerical_feature0,
+            get_feature_type_and_encode(categorical_feature1)[0],
+        ]
+    )
+
+    # Run
+    cm_value = ccc_ndarray(X, np.array([True, False]))
+
+    # Validate
+    assert cm_value == ccc(numerical_feature0, categorical_feature1)
+    assert cm_value == 1.0
+
+
 def test_cm_x_y_are_pandas_series():
     # Prepare
     np.random.seed(123)
@@ -542,6 +869,26 @@ def test_get_parts_simple():
     assert len(np.unique(parts[1])) == 3
 
 
+def test_get_parts_with_few_quantiles():
+    # with many objects and a few quantiles, data is not sorted (see
+    # run_quantile_clustering_by_partition)
+    np.random.seed(0)
+
+    feature0 = np.random.rand(10000)
+    feature0[:3000] = 0.0
+
+    for range_n_clusters in ((2,), (2, 3), (3,)):
+        # run
+        parts = get_parts(feature0, range_n_clusters)
+
+        # validate
+        assert parts.shape == (len(range_n_clusters), feature0.shape[0])
+        for idx, k in enumerate(range_n_clusters):
+            np.testing.assert_array_equal(
+                parts[idx], run_quantile_clustering(feature0, k)
+            )
+
+
 def test_get_parts_with_singletons():
     np.random.seed(0)
 
@@ -580,6 +927,129 @@ def test_get_parts_with_categorical_feature():
     np.testing.assert_array_equal(np.unique(parts[1]), np.array([-1]))
 
 
+def test_get_feature_parts():
+    np.random.seed(0)
+
+    # a numerical feature, a numerical feature with all the same values, and a
+    # categorical feature
+    X = np.array(
+        [
+            np.random.rand(10),
+            np.array([1.3] * 10),
+            np.array([0, 1, 2, 0, 1, 2, 0, 1, 2, 0], dtype=float),
+        ]
+    )
+    X_numerical_type = np.array([True, True, False])
+    range_n_clusters = np.array([2, 3], dtype=np.uint16)
+
+    # run
+    parts, features_valid = get_feature_parts(X, X_numerical_type, range_n_clusters)
+    assert parts.shape == (3, 2, 10)
+    assert parts.flags["C_CONTIGUOUS"]
+
+    for f_idx in range(X.shape[0]):
+        np.testing.assert_array_equal(
+            parts[f_idx],
+            get_parts(X[f_idx], (2, 3), data_is_numerical=X_numerical_type[f_idx]),
+        )
+
+    # only the feature with all the same values is not valid
+    np.testing.assert_array_equal(features_valid, np.array([True, False, True]))
+
+
+def test_get_feature_parts_sequential_same_as_parallel():
+    np.random.seed(0)
+
+    X = np.random.rand(20, 100)
+    X[3] = 1.0
+    X_numerical_type = np.full(X.shape[0], True)
+    X_numerical_type[5] = False
+    X[5] = np.random.randint(0, 4, X.shape[1])
+    range_n_clusters = get_range_n_clusters(X.shape[1])
+
+    # run
+    parts, features_valid = get_feature_parts_sequential(
+        X, X_numerical_type, range_n_clusters
+    )
+
+    # validate
+    expected_parts, expected_features_valid = get_feature_parts(
+        X, X_numerical_type, range_n_clusters
+    )
+    np.testing.assert_array_equal(parts, expected_parts)
+    np.testing.assert_array_equal(features_valid, expected_features_valid)
+    assert not features_valid[3]
+
+
+def test_get_feature_parts_int8_same_as_int16():
+    np.random.seed(0)
+
+    X = np.random.rand(20, 100)
+    X[3] = 1.0
+    X_numerical_type = np.full(X.shape[0], True)
+    X_numerical_type[5] = False
+    X[5] = np.random.randint(0, 4, X.shape[1])
+    range_n_clusters = get_range_n_clusters(X.shape[1])
+
+    expected_parts, expected_features_valid = get_feature_parts(
+        X, X_numerical_type, range_n_clusters
+    )
+    assert expected_parts.dtype == np.int16
+
+    for feature_parts_func in (get_feature_parts, get_feature_parts_sequential):
+        # run
+        parts, features_valid = feature_parts_func(
+            X, X_numerical_type, range_n_clusters, np.int8
+        )
+
+        # validate
+        assert parts.dtype == np.int8
+        np.testing.assert_array_equal(parts, expected_parts)
+        np.testing.assert_array_equal(features_valid, expected_features_valid)
+
+
+def test_get_parts_stats():
+    parts = np.array(
+        [
+            [0, 0, 1, 1, 1, 2],
+            [1, 1, 2, 2, 3, 3],
+            [-2, -2, -2, -2, -2, -2],
+        ]
+    )
+
+    parts_k, parts_sum_squares = get_parts_stats(parts)
+
+    np.testing.assert_array_equal(parts_k, np.array([3, 4, 0]))
+    np.testing.assert_array_equal(parts_sum_squares, np.array([14, 12, 0]))
+
+
+def test_compute_ari_same_as_sklearn():
+    # Prepare
+    np.random.seed(0)
+
+    parts = np.random.randint(0, 5, size=(10, 200))
+    parts_k, parts_sum_squares = get_parts_stats(parts)
+
+    # the buffer is reused across calls
+    cont_buffer = np.empty((parts_k.max(), parts_k.max()), dtype=np.int64)
+
+    for i in range(parts.shape[0]):
+        for j in range(parts.shape[0]):
+            # Run
+            observed_ari = compute_ari(
+                parts[i],
+                parts[j],
+                parts_k[i],
+                parts_k[j],
+                parts_sum_squares[i],
+                parts_sum_squares[j],
+                cont_buffer,
+            )
+
+            # Validate
+            assert observed_ari == pytest.approx(ari(parts[i], parts[j]))
+
+
 def test_cdist_parts_one_vs_one():
     from scipy.spatial.distance import cdist
     from sklearn.metrics import adjusted_rand_score as ari
@@ -598,20 +1068,9 @@ def test_cdist_parts_one_vs_one():
     expected_cdist = cdist(parts0, parts1, metric=ari)
     np.testing.assert_array_equal(expected_cdist, np.array([[1.0]]))
 
-    # basic version (one thread)
     observed_cdist = cdist_parts_basic(parts0, parts1)
     np.testing.assert_array_equal(observed_cdist, expected_cdist)
 
-    # with one thread
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        observed_cdist = cdist_parts_parallel(parts0, parts1, executor)
-    np.testing.assert_array_equal(observed_cdist, expected_cdist)
-
-    # with two threads
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        observed_cdist = cdist_parts_parallel(parts0, parts1, executor)
-    np.testing.assert_array_equal(observed_cdist, expected_cdist)
-
 
 def test_cdist_parts_one_vs_one_dissimilar():
     from scipy.spatial.distance import cdist
@@ -631,20 +1090,9 @@ def test_cdist_parts_one_vs_one_dissimilar():
     expected_cdist = cdist(parts0, parts1, metric=ari)
     np.testing.assert_array_equal(expected_cdist, np.array([[-0.022727272727272728]]))
 
-    # basic version (one thread)
     observed_cdist = cdist_parts_basic(parts0, parts1)
     np.testing.assert_array_equal(observed_cdist, expected_cdist)
 
-    # with one thread
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        observed_cdist = cdist_parts_parallel(parts0, parts1, executor)
-    np.testing.assert_array_equal(observed_cdist, expected_cdist)
-
-    # with two threads
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        observed_cdist = cdist_parts_parallel(parts0, parts1, executor)
-    np.testing.assert_array_equal(observed_cdist, expected_cdist)
-
 
 def test_cdist_parts_one_vs_two():
     from scipy.spatial.distance import cdist
@@ -672,20 +1120,9 @@ def test_cdist_parts_one_vs_two():
         ),
     )
 
-    # basic version (one thread)
     observed_cdist = cdist_parts_basic(parts0, parts1)
     np.testing.assert_array_equal(observed_cdist, expected_cdist)
 
-    # with one thread
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        observed_cdist = cdist_parts_parallel(parts0, parts1, executor)
-    np.testing.assert_array_equal(observed_cdist, expected_cdist)
-
-    # with two threads
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        observed_cdist = cdist_parts_parallel(parts0, parts1, executor)
-    np.testing.assert_array_equal(observed_cdist, expected_cdist)
-
 
 def test_cdist_parts_two_vs_two():
     from scipy.spatial.distance import cdist
@@ -715,21 +1152,253 @@ def test_cdist_parts_two_vs_two():
         ),
     )
 
-    # basic version (one thread)
     observed_cdist = cdist_parts_basic(parts0, parts1)
     np.testing.assert_array_equal(observed_cdist, expected_cdist)
 
-    # with one thread
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        observed_cdist = cdist_parts_parallel(parts0, parts1, executor)
+
+def test_get_parts_ids():
+    parts = np.array(
+        [
+            [
+                [0, 0, 1, 1, 2, 2],
+                [0, 1, 0, 1, 0, 1],
+            ],
+            [
+                [0, 1, 0, 1, 0, 1],
+                [-2, -2, -2, -2, -2, -2],
+            ],
+            [
+                [0, 0, 1, 1, 2, 2],
+                [-2, -2, -2, -2, -2, -2],
+            ],
+        ]
+    )
+
+    parts_ids = get_parts_ids(parts)
+    assert parts_ids.shape == (3, 2)
+
+    # identical partitions share the same id
+    assert parts_ids[0, 0] == parts_ids[2, 0]
+    assert parts_ids[0, 1] == parts_ids[1, 0]
+    assert parts_ids[1, 1] == parts_ids[2, 1]
+
+    # different partitions have different ids
+    assert len(np.unique(parts_ids)) == 3
+
+
+def test_cdist_parts_cached():
+    from scipy.spatial.distance import cdist
+    from sklearn.metrics import adjusted_rand_score as ari
+
+    parts0 = np.array(
+        [
+            [1, 1, 2, 2, 3, 3],
+            [1, 1, 2, 1, 3, 3],
+        ]
+    )
+    parts1 = np.array(
+        [
+            [3, 3, 1, 1, 2, 3],
+            [1, 1, 2, 2, 3, 3],
+        ]
+    )
+    parts_ids = get_parts_ids(np.array([parts0, parts1]))
+
+    expected_cdist = cdist(parts0, parts1, metric=ari)
+
+    n_parts_ids = parts_ids.max() + 1
+    ari_cache = np.full((n_parts_ids, n_parts_ids), np.nan)
+    observed_cdist = cdist_parts_cached(
+        parts0, parts1, parts_ids[0], parts_ids[1], ari_cache
+    )
     np.testing.assert_array_equal(observed_cdist, expected_cdist)
+    # parts0[0] and parts1[1] are the same partition, so only three ARI values
+    # are stored
+    assert (~np.isnan(ari_cache)).sum() == 3
+
+    # the second time, values are taken from the cache
+    ari_cache[~np.isnan(ari_cache)] = -1.0
+    observed_cdist = cdist_parts_cached(
+        parts0, parts1, parts_ids[0], parts_ids[1], ari_cache
+    )
+    np.testing.assert_array_equal(
+        observed_cdist, np.array([[-1.0, 1.0], [-1.0, -1.0]])
+    )
 
-    # with two threads
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        observed_cdist = cdist_parts_parallel(parts0, parts1, executor)
+    # without cache
+    observed_cdist = cdist_parts_cached(
+        parts0, parts1, parts_ids[0], parts_ids[1], np.empty((0, 0))
+    )
     np.testing.assert_array_equal(observed_cdist, expected_cdist)
 
 
+def test_get_ari_cached():
+    part0 = np.array([0, 0, 1, 1, 2, 2])
+    part1 = np.array([2, 2, 0, 0, 1, 2])
+    k0, k1 = 3, 3
+    sum_squares0 = 12
+    sum_squares1 = 14
+    cont_buffer = np.empty((3, 3), dtype=np.int64)
+
+    ari_cache = np.full((3, 3), np.nan)
+    observed_ari = get_ari_cached(
+        part0, part1, 2, 0, k0, k1, sum_squares0, sum_squares1, ari_cache, cont_buffer
+    )
+    assert observed_ari == ari(part0, part1)
+    # the value is stored with the smallest id first
+    assert ari_cache[0, 2] == observed_ari
+    assert np.isnan(ari_cache).sum() == 8
+
+    # the second time, the value is taken from the cache
+    ari_cache[0, 2] = -1.0
+    assert (
+        get_ari_cached(
+            part0,
+            part1,
+            2,
+            0,
+            k0,
+            k1,
+            sum_squares0,
+            sum_squares1,
+            ari_cache,
+            cont_buffer,
+        )
+        == -1.0
+    )
+
+    # partitions with the same id are identical
+    assert (
+        get_ari_cached(
+            part0,
+            part1,
+            1,
+            1,
+            k0,
+            k1,
+            sum_squares0,
+            sum_squares1,
+            ari_cache,
+            cont_buffer,
+        )
+        == 1.0
+    )
+
+    # without cache
+    assert get_ari_cached(
+        part0,
+        part1,
+        2,
+        0,
+        k0,
+        k1,
+        sum_squares0,
+        sum_squares1,
+        np.empty((0, 0)),
+        cont_buffer,
+    ) == ari(part0, part1)
+
+
+def test_get_ari_upper_bound():
+    np.random.seed(0)
+
+    n_objects = 100
+    for _ in range(200):
+        part0 = np.random.randint(0, np.random.randint(2, 10), n_objects)
+        part1 = np.random.randint(0, np.random.randint(2, 10), n_objects)
+        part1[: n_objects // 2] = part0[: n_objects // 2]
+
+        parts_k, parts_sum_squares = get_parts_stats(np.array([part0, part1]))
+        upper_bound = get_ari_upper_bound(
+            n_objects, parts_sum_squares[0], parts_sum_squares[1]
+        )
+
+        assert upper_bound >= ari(part0, part1)
+        assert upper_bound >= ari(part0, part0[np.random.permutation(n_objects)])
+
+    # partitions with the same cluster sizes could be identical
+    part0 = np.array([0, 0, 1, 1, 2, 2])
+    parts_k, parts_sum_squares = get_parts_stats(np.array([part0, part0[::-1]]))
+    assert get_ari_upper_bound(6, parts_sum_squares[0], parts_sum_squares[1]) == 1.0
+
+
+def test_get_features_parts_stats():
+    np.random.seed(0)
+
+    parts = np.random.randint(0, 5, (4, 3, 20)).astype(np.int16)
+    parts[1, 2] = -1
+
+    # run
+    parts_k, parts_sum_squares = get_features_parts_stats(parts)
+
+    # validate
+    assert parts_k.shape == (4, 3)
+    assert parts_sum_squares.shape == (4, 3)
+    for f_idx in range(parts.shape[0]):
+        expected_k, expected_sum_squares = get_parts_stats(parts[f_idx])
+        np.testing.assert_array_equal(parts_k[f_idx], expected_k)
+        np.testing.assert_array_equal(parts_sum_squares[f_idx], expected_sum_squares)
+
+
+def test_get_max_ari_same_as_cdist_parts():
+    np.random.seed(0)
+
+    n_objects = 100
+    for _ in range(50):
+        # partitions with different relationships, including identical ones
+        # and empty partitions (categorical features)
+        base_part = np.random.randint(0, 4, n_objects)
+        x = np.array(
+            [
+                np.random.randint(0, k, n_objects)
+                if np.random.rand() < 0.5
+                else (base_part + np.random.randint(0, 2, n_objects)) % k
+                for k in range(2, 8)
+            ]
+        ).astype(np.int16)
+        y = np.array(
+            [
+                np.random.randint(0, k, n_objects)
+                if np.random.rand() < 0.5
+                else (base_part + np.random.randint(0, 2, n_objects)) % k
+                for k in range(2, 8)
+            ]
+        ).astype(np.int16)
+        y[2] = x[2]
+        if np.random.rand() < 0.3:
+            y[1:] = -1
+
+        parts = np.array([x, y])
+        parts_ids = get_parts_ids(parts)
+        parts_k, parts_sum_squares = get_features_parts_stats(parts)
+        n_parts_ids = parts_ids.max() + 1
+        cont_buffer = np.empty((parts_k.max(), parts_k.max()), dtype=np.int64)
+
+        expected_max_ari, expected_max_idx = get_ccc_from_cdist(
+            cdist_parts_basic(x, y)
+        )
+
+        # with and without cache of ARI values
+        for ari_cache in (np.full((n_parts_ids, n_parts_ids), np.nan), np.empty((0, 0))):
+            # run
+            max_ari, max_idx = get_max_ari(
+                x,
+                y,
+                parts_ids[0],
+                parts_ids[1],
+                parts_k[0],
+                parts_k[1],
+                parts_sum_squares[0],
+                parts_sum_squares[1],
+                ari_cache,
+                cont_buffer,
+            )
+
+            # validate
+            assert max_ari == expected_max_ari
+            assert max_idx == expected_max_idx
+
+
 def test_get_coords_from_index():
     # data is an example with n_obj = 5 just to illustrate
     # data = np.array(
@@ -791,6 +1460,31 @@ def test_get_coords_from_index_smaller():
     assert res == (2, 3)
 
 
+def test_get_coords_from_index_same_as_triu_indices():
+    for n_obj in (2, 3, 10, 101):
+        rows, cols = np.triu_indices(n_obj, k=1)
+
+        for idx in range(rows.shape[0]):
+            assert get_coords_from_index(n_obj, idx) == (rows[idx], cols[idx])
+
+
+def test_get_coords_from_index_many_objects():
+    # with many objects, the condensed index is large and the floating point
+    # square root is not precise enough to get the row
+    n_obj = 200000
+    n_comp = (n_obj * (n_obj - 1)) // 2
+
+    for i in (0, 1, 1000, 99999, 150000, n_obj - 3, n_obj - 2):
+        # index of the first and last elements of row i
+        first_idx = i * (2 * n_obj - i - 1) // 2
+        last_idx = first_idx + (n_obj - i - 2)
+
+        assert get_coords_from_index(n_obj, first_idx) == (i, i + 1)
+        assert get_coords_from_index(n_obj, last_idx) == (i, n_obj - 1)
+
+    assert get_coords_from_index(n_obj, n_comp - 1) == (n_obj - 2, n_obj - 1)
+
+
 def test_cm_values_equal_to_original_implementation():
     # compare with results obtained from the original ccc
     # implementation (https://github.com/sinc-lab/clustermatch) plus some
@@ -1345,6 +2039,27 @@ def test_cm_numerical_and_categorical_features_too_many_categories():
     assert ccc(categorical_feature1, numerical_feature0) == cm_value
 
 
+def test_cm_categorical_features_with_more_categories_than_int8():
+    # Prepare
+    np.random.seed(123)
+
+    # two identical categorical features with 200 categories (cluster labels
+    # do not fit in int8) on 400 objects
+    categorical_feature0 = np.array([f"cat{idx % 200:d}" for idx in range(400)])
+    np.random.shuffle(categorical_feature0)
+    categorical_feature1 = categorical_feature0.copy()
+
+    # Run
+    cm_value, max_parts, parts = ccc(
+        categorical_feature0, categorical_feature1, return_parts=True
+    )
+
+    # Validate
+    assert cm_value == 1.0
+    assert parts.dtype == np.int16
+    assert parts[:, 0].max() == 199
+
+
 def test_cm_numerical_and_categorical_features_a_single_categorical_value():
     # Prepare
     np.random.seed(123)
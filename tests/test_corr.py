@@ -120,6 +120,22 @@ def test_corr_pearson_manual():
     assert test_result.iloc[1, 1] == 1.0
 
 
+def test_corr_pearson_perfect_correlation():
+    np.random.seed(0)
+
+    x = np.random.rand(1000)
+    test_data = pd.DataFrame(np.array([x, x * 3.0 + 1.0, -x]))
+
+    test_result = corr.pearson(test_data)
+    assert np.isclose(test_result.iloc[0, 1], 1.0)
+    assert np.isclose(test_result.iloc[0, 2], -1.0)
+    assert np.isclose(test_result.iloc[1, 2], -1.0)
+
+    # values are always within [-1, 1]
+    assert test_result.to_numpy().max() <= 1.0
+    assert test_result.to_numpy().min() >= -1.0
+
+
 def test_corr_spearman():
     # run basic tests first
     data, corr_mat = _run_basic_checks(corr.spearman)
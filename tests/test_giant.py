@@ -1,4 +1,5 @@
 import sys
+from unittest.mock import MagicMock, patch
 
 import pandas as pd
 import pytest
@@ -9,7 +10,8 @@ if not sys.platform.startswith("linux"):
         "Skipping REST test on GIANT in non-Linux systems", allow_module_level=True
     )
 
-from ccc.giant import gene_exists, predict_tissue, get_network
+from ccc import giant
+from ccc.giant import gene_exists, predict_tissue, rank_genes, get_network
 
 
 # Gene mappings used in unit tests
@@ -36,6 +38,63 @@ def test_gene_exists_gene_doest_not_exist():
     assert not gene_exists(000000)
 
 
+def _get_response(status_code, data=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = data
+    return response
+
+
+def test_gene_exists_is_cached():
+    responses = [_get_response(200, {"entrez": 3458, "standard_name": "IFNG"})]
+
+    with patch.dict(giant.GENE_EXISTS_CACHE, clear=True), patch.object(
+        giant.SESSION, "get", side_effect=responses
+    ) as session_get:
+        assert gene_exists(3458)
+        assert gene_exists(3458)
+        assert gene_exists("3458")
+        assert session_get.call_count == 1
+
+
+def test_gene_exists_failed_request_is_not_cached():
+    responses = [
+        _get_response(503),
+        _get_response(200, {"entrez": 3458, "standard_name": "IFNG"}),
+    ]
+
+    with patch.dict(giant.GENE_EXISTS_CACHE, clear=True), patch.object(
+        giant.SESSION, "get", side_effect=responses
+    ) as session_get:
+        # a transient server error
+        assert not gene_exists(3458)
+        assert "3458" not in giant.GENE_EXISTS_CACHE
+
+        # the gene is requested again
+        assert gene_exists(3458)
+        assert session_get.call_count == 2
+
+
+def test_predict_tissue_failed_request_is_not_cached():
+    with patch.dict(giant.GENE_EXISTS_CACHE, clear=True), patch.dict(
+        giant.TISSUE_PREDICTION_CACHE, clear=True
+    ), patch.object(giant.SESSION, "get", return_value=_get_response(503)):
+        assert predict_tissue(("3458", "10993")) is None
+        assert len(giant.TISSUE_PREDICTION_CACHE) == 0
+
+
+def test_predict_tissue_accepts_lists():
+    tissue_prediction = (
+        "blood",
+        "http://hb.flatironinstitute.org/api/integrations/blood/",
+    )
+
+    with patch.dict(
+        giant.TISSUE_PREDICTION_CACHE, {("3458", "10993"): tissue_prediction}
+    ):
+        assert predict_tissue(["3458", "10993"]) == tissue_prediction
+
+
 def test_predict_tissue_gene_pair_exists():
     assert predict_tissue(("6903", "3458")) == (
         "nervous-system",
@@ -54,6 +113,32 @@ def test_predict_tissue_top_tissue_is_not_brenda():
     )
 
 
+def test_rank_genes():
+    edges = pd.DataFrame(
+        [
+            ("A", "Q0", 0.9),
+            ("Q1", "A", 0.7),
+            ("B", "Q0", 0.2),
+            ("B", "Q1", 0.4),
+            ("C", "Q1", 0.5),
+            ("A", "B", 0.1),
+            ("C", "B", 0.8),
+        ],
+        columns=["gene1", "gene2", "weight"],
+    )
+
+    # Run
+    genes_ranks = rank_genes({"A", "B", "C"}, edges, ("Q0", "Q1"))
+
+    # Validate
+    # connections to query genes are averaged: A=0.8, B=0.3, C=0.5, and
+    # connections among non-query genes are not considered
+    pd.testing.assert_series_equal(
+        genes_ranks.sort_index(),
+        pd.Series([0, 2, 1], index=pd.Index(["A", "B", "C"], name="gene"), name="rank"),
+    )
+
+
 def test_get_network_parameters_not_provided():
     with pytest.raises(ValueError) as e:
         get_network()
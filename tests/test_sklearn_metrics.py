@@ -3,6 +3,7 @@ from sklearn.metrics import adjusted_rand_score as sklearn_ari
 
 from ccc.sklearn.metrics import (
     adjusted_rand_index,
+    get_adjusted_rand_index_from_pair_counts,
     get_contingency_matrix,
     get_pair_confusion_matrix,
 )
@@ -127,3 +128,22 @@ def test_adjusted_rand_index_random_partitions_k0_greater_k1():
 
     assert observed_ari == observed_ari_symm
     assert expected_ari == observed_ari
+
+
+def test_get_adjusted_rand_index_from_pair_counts():
+    part0 = np.array([0, 0, 1, 1, 2, 2])
+    part1 = np.array([0, 1, 0, 2, 1, 2])
+
+    (tn, fp), (fn, tp) = get_pair_confusion_matrix(part0, part1)
+    observed_ari = get_adjusted_rand_index_from_pair_counts(tn, fp, fn, tp)
+
+    assert observed_ari == -0.25
+
+
+def test_get_adjusted_rand_index_from_pair_counts_perfect_match():
+    part0 = np.array([0, 0, 1, 1, 2, 2])
+
+    (tn, fp), (fn, tp) = get_pair_confusion_matrix(part0, part0)
+    observed_ari = get_adjusted_rand_index_from_pair_counts(tn, fp, fn, tp)
+
+    assert observed_ari == 1.0